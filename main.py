@@ -1,4 +1,8 @@
+from multiprocessing import freeze_support
+
 from upstream_config_util import main
 
 if __name__ == "__main__":
+    # sharded scans start worker processes, which frozen builds need this for
+    freeze_support()
     main()
@@ -22,6 +22,42 @@ _settings = {
     "goldshell_password": "123456789",
     "reboot_threads": 300,
     "config_threads": 300,
+    "data_threads": 300,
+    "scan_queue_size": 1000,
+    "scan_cancel_timeout": 5,
+    "scan_include": ["hashrate", "wattage", "fw_ver"],
+    "scan_backfill": "background",
+    "backfill_threads": 50,
+    "scan_retry": True,
+    "retry_threads": 20,
+    "retry_timeout": 15,
+    "scan_shards": 0,
+    "shard_batch_size": 100,
+    "shard_batch_interval": 0.5,
+    "fast_rescan": False,
+    "miner_ttl": 1800,
+    "connection_pool": True,
+    "connection_idle_limit": 1000,
+    "connection_idle_timeout": 60,
+    "data_cache": True,
+    "data_ttl": 10,
+    "data_ttls": {
+        "fw_ver": 600,
+        "api_ver": 600,
+        "config": 600,
+        "hostname": 600,
+        "expected_hashrate": 600,
+        "wattage_limit": 600,
+        "mac": 600,
+    },
+    "scan_probe": False,
+    "probe_ports": [4028, 80, 443, 22],
+    "probe_timeout": 0.5,
+    "probe_threads": 500,
+    "scan_jobs": [],
+    "table_refresh_rate": 10,
+    "virtual_table_rows": 5000,
+    "virtual_table_margin": 100,
     "log_to_file": False,
     "debug": False,
     "include": [
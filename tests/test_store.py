@@ -0,0 +1,60 @@
+from upstream_config_util.fleet.store import TOTAL_FIELDS, FleetStore
+
+
+def make_store() -> FleetStore:
+    store = FleetStore()
+    store.update(
+        "10.0.0.1",
+        {
+            "hashrate": 110.5,
+            "expected_hashrate": 112.0,
+            "wattage": 3250,
+            "wattage_limit": 3300,
+        },
+    )
+    store.update("10.0.0.2", {"hashrate": None, "wattage": 3100})
+    store.update("10.0.0.3", {"hashrate": 95.25, "expected_hashrate": 100.0})
+    return store
+
+
+def test_selected_totals_all_rows_match_total():
+    store = make_store()
+    totals = store.selected_totals(set(store.index.values()))
+    for field in TOTAL_FIELDS:
+        assert totals[field] == store.total(field)
+
+
+def test_selected_totals_loop_matches_total():
+    store = make_store()
+    rows = set(store.index.values())
+    # one row short of everything, so the totals are summed row by row
+    partial = store.selected_totals(rows - {store.index["10.0.0.2"]})
+    only = store.selected_totals({store.index["10.0.0.2"]})
+    for field in TOTAL_FIELDS:
+        assert partial[field] + only[field] == store.total(field)
+
+
+def test_selected_totals_skip_unset_cells():
+    store = make_store()
+    totals = store.selected_totals({store.index["10.0.0.2"]})
+    assert totals == {
+        "hashrate": 0,
+        "expected_hashrate": 0,
+        "wattage": 3100,
+        "wattage_limit": 0,
+    }
+
+
+def test_update_keeps_fractional_values():
+    store = FleetStore()
+    store.update("10.0.0.1", {"temperature_avg": 65.9, "percent_expected_chips": 99.5})
+    record = store["10.0.0.1"]
+    assert record["temperature_avg"] == 65.9
+    assert record["percent_expected_chips"] == 99.5
+
+
+def test_update_unchanged_after_cast():
+    store = FleetStore()
+    store.update("10.0.0.1", {"wattage": 3250.4})
+    assert not store.update("10.0.0.1", {"wattage": 3250.4})
+    assert store["10.0.0.1"]["wattage"] == 3250
@@ -1,9 +1,6 @@
 import asyncio
 import sys
 import logging
-import FreeSimpleGUI as sg
-
-from .ui import ui
 
 # # Fix bug with some whatsminers and asyncio because of a socket not being shut down:
 # if (
@@ -31,6 +28,18 @@ def main():
 
     init_logger()
 
+    from .fleet.connections import install_connection_pool
+
+    install_connection_pool()
+
+    # run headless when given a command, the GUI is only imported when needed
+    if len(sys.argv) > 1:
+        from .cli import cli
+
+        sys.exit(cli(sys.argv[1:]))
+
+    from .ui import ui
+
     loop = asyncio.get_event_loop()
 
     # loop.set_exception_handler(handle_exception)
@@ -0,0 +1,178 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+from pyasic import APIError
+
+from upstream_config_util.fleet.connections import close_connections
+from upstream_config_util.fleet.fetch import fetch_data, got_data
+from upstream_config_util.fleet.identity import IDENTITY_CACHE
+from upstream_config_util.fleet.jobs import ScanJob, load_scan_jobs
+from upstream_config_util.fleet.pipeline import Pipeline
+from upstream_config_util.fleet.scanner import retry_pass, scan_jobs
+from upstream_config_util.fleet.shards import sharded_scan
+import settings
+
+# nothing here may import the GUI, so headless sweeps skip Tk, matplotlib and reportlab
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Run the config tool without the GUI.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    scan = commands.add_parser(
+        "scan",
+        help="Scan for miners and write one JSON object per miner as they are found.",
+    )
+    scan.add_argument(
+        "targets",
+        nargs="*",
+        help='Subnets or IP ranges to scan, i.e. "10.0.0.0/24" or "10.0.1.1-50".  '
+        "Defaults to the scan jobs in the settings.",
+    )
+    scan.add_argument(
+        "-x",
+        "--exclude",
+        action="append",
+        default=[],
+        help="A subnet or IP range to leave out of every job, "
+        "can be given more than once.",
+    )
+    scan.add_argument(
+        "-j", "--jobs", help="A .toml file with [[scan_jobs]] tables to scan."
+    )
+    scan.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="The file to write JSON Lines to, defaults to stdout.",
+    )
+    scan.add_argument(
+        "-i",
+        "--include",
+        help='Comma separated data to get, i.e. "hashrate,wattage".  '
+        "Defaults to the include setting.",
+    )
+    return parser
+
+
+def cli(args: list = None) -> int:
+    args = get_parser().parse_args(args)
+    if args.command == "scan":
+        return cli_scan(args)
+    return 1
+
+
+def cli_scan(args: argparse.Namespace) -> int:
+    try:
+        if args.jobs:
+            jobs = load_scan_jobs(os.path.expanduser(args.jobs))
+        elif args.targets:
+            jobs = [ScanJob(args.targets)]
+        else:
+            jobs = [ScanJob.from_dict(job) for job in settings.get("scan_jobs", [])]
+        if args.exclude:
+            jobs = [job.excluding(args.exclude) for job in jobs]
+    except (OSError, ValueError) as e:
+        print(f"Failed to load scan jobs: {e}", file=sys.stderr)
+        return 1
+    if not jobs:
+        print("Nothing to scan, pass targets or --jobs.", file=sys.stderr)
+        return 1
+
+    include = settings.get("include")
+    if args.include:
+        include = [option.strip() for option in args.include.split(",")]
+
+    if args.output == "-":
+        return asyncio.run(_run(scan_to_jsonl(jobs, sys.stdout, include)))
+    with open(args.output, "w") as output:
+        return asyncio.run(_run(scan_to_jsonl(jobs, output, include)))
+
+
+async def _run(coro):
+    try:
+        return await coro
+    finally:
+        await close_connections()
+
+
+async def scan_to_jsonl(jobs: list, output, include: list = None) -> int:
+    """Scan the jobs and write one JSON line per miner, including the failed ones."""
+    shards = settings.get("scan_shards", 0)
+    if shards > 1:
+        return await _sharded_scan_to_jsonl(jobs, shards, output, include)
+
+    failed = {}
+
+    async def get_data(miner):
+        try:
+            data = await fetch_data(miner, include=include)
+            if not got_data(data, include):
+                raise APIError("No data returned from the miner.")
+        except Exception as e:
+            failed[str(miner.ip)] = (miner, e)
+            return
+        failed.pop(str(miner.ip), None)
+        output.write(_json_line(data.asdict()))
+        output.flush()
+        IDENTITY_CACHE.add(miner, mac=data.mac, fw_ver=data.fw_ver)
+
+    pipeline = Pipeline(
+        _discover_miners(scan_jobs(jobs)),
+        get_data,
+        workers=settings.get("data_threads", 300),
+        queue_size=settings.get("scan_queue_size", 1000),
+        cancel_timeout=settings.get("scan_cancel_timeout", 5),
+    )
+    await pipeline.run()
+    logging.info(f"Scanned {sum(len(job) for job in jobs)} hosts. {pipeline.summary()}")
+
+    if failed and not pipeline.cancelled and settings.get("scan_retry", True):
+        retry = await retry_pass([miner for miner, _ in failed.values()], get_data)
+        logging.info(f"Retried {retry.discovered.count} miners. {retry.summary()}")
+
+    for ip, (_, error) in failed.items():
+        output.write(_json_line({"ip": ip, "error": str(error)}))
+    output.flush()
+    IDENTITY_CACHE.save()
+    return 130 if pipeline.cancelled else 0
+
+
+async def _sharded_scan_to_jsonl(jobs: list, shards: int, output, include: list):
+    try:
+        async for _, batch in sharded_scan(jobs, shards, include):
+            for data, miner_class in batch:
+                if miner_class is None:
+                    data = {**data, "error": "Failed to get data"}
+                else:
+                    IDENTITY_CACHE.add_entry(
+                        data["ip"], miner_class, data.get("mac"), data.get("fw_ver")
+                    )
+                output.write(_json_line(data))
+            output.flush()
+    except asyncio.CancelledError:
+        return 130
+    finally:
+        IDENTITY_CACHE.save()
+    return 0
+
+
+def _json_line(data: dict) -> str:
+    # sharded scans only get dicts back, so every line is written from one
+    return json.dumps(data, default=str) + "\n"
+
+
+async def _discover_miners(scan_generator):
+    try:
+        async for miner in scan_generator:
+            if miner is not None:
+                yield miner
+    finally:
+        await scan_generator.aclose()
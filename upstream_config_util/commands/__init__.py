@@ -4,11 +4,12 @@ from typing import Tuple
 import FreeSimpleGUI as sg
 
 import settings
-from pyasic.miners.factory import miner_factory
 from pyasic.miners.listener import MinerListener
 from upstream_config_util.decorators import disable_buttons
+from upstream_config_util.fleet.registry import MINER_REGISTRY
 from upstream_config_util.general import btn_all
 from upstream_config_util.layout import window, update_prog_bar, WINDOW_ICON
+from upstream_config_util import tables
 from upstream_config_util.tables import TABLE_MANAGER
 
 
@@ -16,22 +17,22 @@ async def handle_event(event, value):
     # commands tab
     if event == "cmd_all":
         _table = "cmd_table"
-        btn_all(_table, value[_table])
+        btn_all(_table, tables.selected_rows(_table))
     if event == "cmd_light":
         _table = "cmd_table"
-        _ips = value[_table]
+        _ips = tables.selected_rows(_table)
         asyncio.create_task(btn_light(_ips))
     if event == "cmd_reboot":
         _table = "cmd_table"
-        _ips = value[_table]
+        _ips = tables.selected_rows(_table)
         asyncio.create_task(btn_reboot(_ips))
     if event == "cmd_backend":
         _table = "cmd_table"
-        _ips = value[_table]
+        _ips = tables.selected_rows(_table)
         asyncio.create_task(btn_backend(_ips))
     if event == "btn_cmd":
         _table = "cmd_table"
-        _ips = value[_table]
+        _ips = tables.selected_rows(_table)
         asyncio.create_task(btn_command(_ips, value["cmd_txt"]))
     if event == "cmd_listen":
         asyncio.create_task(btn_listen())
@@ -41,14 +42,10 @@ async def handle_event(event, value):
 
 
 @disable_buttons("Flashing Lights")
-async def btn_light(ip_idxs: list):
-    _table = window["cmd_table"].Widget
-    iids = _table.get_children()
+async def btn_light(ips: list):
     tasks = []
     vals = {}
-    for idx in ip_idxs:
-        item = _table.item(iids[idx])
-        ip = item["values"][0]
+    for ip in ips:
         new_light_val = not TABLE_MANAGER.data[ip]["fault_light"]
         tasks.append(_fault_light(ip, new_light_val))
         vals[ip] = new_light_val
@@ -57,15 +54,24 @@ async def btn_light(ip_idxs: list):
         ip, success = await task
         ip = str(ip)
         if success:
-            TABLE_MANAGER.data[ip]["fault_light"] = vals[ip]
-            TABLE_MANAGER.data[ip]["output"] = "Fault Light command succeeded."
+            TABLE_MANAGER.update_item(
+                {
+                    "ip": ip,
+                    "fault_light": vals[ip],
+                    "output": "Fault Light command succeeded.",
+                }
+            )
         else:
-            TABLE_MANAGER.data[ip]["output"] = "Fault Light command failed."
-        TABLE_MANAGER.update_tables()
+            MINER_REGISTRY.invalidate(ip)
+            TABLE_MANAGER.update_item(
+                {"ip": ip, "output": "Fault Light command failed."}
+            )
 
 
 async def _fault_light(ip: str, on: bool) -> Tuple[str, bool]:
-    miner = await miner_factory.get_miner(ip)
+    miner = await MINER_REGISTRY.get_miner(ip)
+    if miner is None:
+        return ip, False
     if on:
         success = await miner.fault_light_on()
     else:
@@ -73,31 +79,25 @@ async def _fault_light(ip: str, on: bool) -> Tuple[str, bool]:
     return miner.ip, success
 
 
+def _report_unresolved(ips: list, output: str):
+    for ip in ips:
+        TABLE_MANAGER.update_item({"ip": str(ip), "output": output})
+
+
 @disable_buttons("Rebooting")
-async def btn_reboot(ip_idxs: list):
-    _table = window["cmd_table"].Widget
-    iids = _table.get_children()
-    miners = []
-    for idx in ip_idxs:
-        item = _table.item(iids[idx])
-        ip = item["values"][0]
-        miner = await miner_factory.get_miner(ip)
-        miners.append(miner)
-        print(ip)
-        for idx in ip_idxs:
-            item = _table.item(iids[idx])
-            ip = item["values"][0]
-            miner = await miner_factory.get_miner(ip)
-            miners.append(miner)
-
-        sent = reboot_generator(miners)
-        async for done in sent:
-            success = done["Status"]
-            if success:
-                TABLE_MANAGER.data[ip]["output"] = "Reboot command succeeded."
-            else:
-                TABLE_MANAGER.data[ip]["output"] = "Reboot command failed."
-            TABLE_MANAGER.update_tables()
+async def btn_reboot(ips: list):
+    miners, unresolved = await MINER_REGISTRY.get_miners(ips)
+    _report_unresolved(unresolved, "Reboot command failed, miner not found.")
+
+    sent = reboot_generator(miners)
+    async for done in sent:
+        ip = str(done["IP"])
+        success = done["Status"]
+        if success:
+            TABLE_MANAGER.update_item({"ip": ip, "output": "Reboot command succeeded."})
+        else:
+            MINER_REGISTRY.invalidate(ip)
+            TABLE_MANAGER.update_item({"ip": ip, "output": "Reboot command failed."})
 
 
 async def reboot_generator(miners: list):
@@ -122,43 +122,62 @@ async def _reboot(miner):
 
 
 @disable_buttons("Restarting Backend")
-async def btn_backend(ip_idxs: list):
-    _table = window["cmd_table"].Widget
-    iids = _table.get_children()
-    for idx in ip_idxs:
-        item = _table.item(iids[idx])
-        ip = item["values"][0]
-        miner = await miner_factory.get_miner(ip)
-        success = await miner.restart_backend()
+async def btn_backend(ips: list):
+    miners, unresolved = await MINER_REGISTRY.get_miners(ips)
+    _report_unresolved(unresolved, "Restart Backend command failed, miner not found.")
+
+    sent = restart_backend_generator(miners)
+    async for done in sent:
+        ip = str(done["IP"])
+        success = done["Status"]
         if success:
-            TABLE_MANAGER.data[ip]["output"] = "Restart Backend command succeeded."
+            TABLE_MANAGER.update_item(
+                {"ip": ip, "output": "Restart Backend command succeeded."}
+            )
         else:
-            TABLE_MANAGER.data[ip]["output"] = "Restart Backend command failed."
-    TABLE_MANAGER.update_tables()
+            MINER_REGISTRY.invalidate(ip)
+            TABLE_MANAGER.update_item(
+                {"ip": ip, "output": "Restart Backend command failed."}
+            )
+
+
+async def restart_backend_generator(miners: list):
+    loop = asyncio.get_event_loop()
+    restart_tasks = []
+    for miner in miners:
+        if len(restart_tasks) >= settings.get("reboot_threads", 300):
+            cmd_sent = asyncio.as_completed(restart_tasks)
+            restart_tasks = []
+            for done in cmd_sent:
+                yield await done
+        restart_tasks.append(loop.create_task(_restart_backend(miner)))
+    cmd_sent = asyncio.as_completed(restart_tasks)
+    for done in cmd_sent:
+        yield await done
+
+
+async def _restart_backend(miner):
+    proc = await miner.restart_backend()
+    return {"IP": miner.ip, "Status": proc}
 
 
 @disable_buttons("Sending Command")
-async def btn_command(ip_idxs: list, command: str):
+async def btn_command(ips: list, command: str):
     prog_bar_len = 0
-    await update_prog_bar(prog_bar_len, len(ip_idxs))
-    _table = window["cmd_table"].Widget
-    miners = []
-    iids = _table.get_children()
-    for idx in ip_idxs:
-        item = _table.item(iids[idx])
-        ip = item["values"][0]
-        miner = await miner_factory.get_miner(ip)
-        miners.append(miner)
+    await update_prog_bar(prog_bar_len, len(ips))
+    miners, unresolved = await MINER_REGISTRY.get_miners(ips)
+    _report_unresolved(unresolved, f"Command {command} failed, miner not found.")
+    prog_bar_len += len(unresolved)
+    await update_prog_bar(prog_bar_len, len(ips))
 
     sent = send_command_generator(miners, command)
     async for done in sent:
         success = done["Status"]
         if not isinstance(done["Status"], str):
             success = f"Command {command} failed."
-        TABLE_MANAGER.data[done["IP"]]["output"] = success
+        TABLE_MANAGER.update_item({"ip": str(done["IP"]), "output": success})
         prog_bar_len += 1
-        TABLE_MANAGER.update_tables()
-        await update_prog_bar(prog_bar_len, len(ip_idxs))
+        await update_prog_bar(prog_bar_len, len(ips))
 
 
 async def send_command_generator(miners: list, command: str):
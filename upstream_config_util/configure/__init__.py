@@ -4,9 +4,11 @@ import FreeSimpleGUI as sg
 import yaml
 
 from pyasic.config import MinerConfig
-from pyasic.miners.factory import miner_factory
 import settings
+from upstream_config_util import tables
 from upstream_config_util.decorators import disable_buttons
+from upstream_config_util.fleet.fetch import invalidate_data
+from upstream_config_util.fleet.registry import MINER_REGISTRY
 from upstream_config_util.general import update_miners_data, btn_all, btn_web
 from upstream_config_util.imgs import WINDOW_ICON
 from upstream_config_util.layout import window, update_prog_bar, TABLE_BG
@@ -18,21 +20,21 @@ async def handle_event(event, value):
     # configure tab
     if event == "cfg_all":
         _table = "cfg_table"
-        btn_all(_table, value[_table])
+        btn_all(_table, tables.selected_rows(_table))
     if event == "cfg_web":
         _table = "cfg_table"
-        btn_web(_table, value[_table])
+        btn_web(_table, tables.selected_rows(_table))
     if event == "cfg_generate":
         await generate_config_ui()
     if event == "cfg_import":
         _table = "cfg_table"
-        asyncio.create_task(btn_import(_table, value[_table]))
+        asyncio.create_task(btn_import(_table, tables.selected_rows(_table)))
     if event == "cfg_config":
         _table = "cfg_table"
         asyncio.create_task(
             btn_config(
                 _table,
-                value[_table],
+                tables.selected_rows(_table),
                 value["cfg_config_txt"],
                 value["cfg_append_ip"],
             )
@@ -44,7 +46,9 @@ async def btn_import(table, selected):
     if not len(selected) > 0:
         return
     ip = [window[table].Values[row][0] for row in selected][0]
-    miner = await miner_factory.get_miner(ip)
+    miner = await MINER_REGISTRY.get_miner(ip)
+    if miner is None:
+        return
     config = await miner.get_config()
     if config:
         window["cfg_config_txt"].update(yaml.dump(config.as_dict(), sort_keys=False))
@@ -60,12 +64,17 @@ async def send_config(ips: list, config: str, last_octet_ip: bool):
     global progress_bar_len
     progress_bar_len = 0
     await update_prog_bar(progress_bar_len, _max=(2 * len(ips)))
-    get_miner_genenerator = miner_factory.get_miner_generator(ips)
-    all_miners = []
-    async for miner in get_miner_genenerator:
-        all_miners.append(miner)
-        progress_bar_len += 1
-        await update_prog_bar(progress_bar_len)
+    all_miners, unresolved = await MINER_REGISTRY.get_miners(ips)
+    progress_bar_len += len(ips)
+    await update_prog_bar(progress_bar_len)
+    if unresolved:
+        sg.popup_non_blocking(
+            f"Could not identify {len(unresolved)} of {len(ips)} miners, "
+            f"they were not configured:\n{', '.join(map(str, unresolved))}",
+            title="Miners Not Found",
+            keep_on_top=True,
+            icon=WINDOW_ICON,
+        )
 
     config_sender_generator = send_config_generator(
         all_miners, config, last_octet_ip_user=last_octet_ip
@@ -73,6 +82,8 @@ async def send_config(ips: list, config: str, last_octet_ip: bool):
     async for _config_sender in config_sender_generator:
         progress_bar_len += 1
         await update_prog_bar(progress_bar_len)
+    for ip in ips:
+        invalidate_data(ip)
     await asyncio.sleep(3)
     await update_miners_data(ips)
 
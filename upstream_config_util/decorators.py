@@ -12,12 +12,13 @@ def disable_buttons(status: str = ""):
             window["status"].update(status)
 
             # call the original wrapped function
-            await func(*args, **kwargs)
-
-            # re-enable the buttons after the wrapped function completes
-            for button in BUTTON_KEYS:
-                window[button].Update(disabled=False)
-            window["status"].update("")
+            try:
+                await func(*args, **kwargs)
+            finally:
+                # re-enable the buttons after the wrapped function completes
+                for button in BUTTON_KEYS:
+                    window[button].Update(disabled=False)
+                window["status"].update("")
 
         return inner
 
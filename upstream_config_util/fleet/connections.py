@@ -0,0 +1,191 @@
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+import httpx
+from pyasic import settings as pyasic_settings
+from pyasic.ssh.base import BaseSSH
+
+import settings
+
+# pyasic's own ways to connect, used for new connections and when pooling is off
+_open_transport = pyasic_settings.transport
+_open_ssh_connection = BaseSSH._get_connection
+
+
+class PooledSSHConnection:
+    """An SSH connection shared by every command sent to one miner."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.users = 0
+        self.failed = False
+        self.retired = False
+        self.last_used = time.monotonic()
+
+    async def __aenter__(self):
+        self.users += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.users -= 1
+        self.last_used = time.monotonic()
+        if exc_type is not None:
+            self.failed = True
+        if self.retired and not self.users:
+            self.conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    @property
+    def closed(self) -> bool:
+        if self.failed:
+            return True
+        is_closed = getattr(self.conn, "is_closed", None)
+        return is_closed() if is_closed is not None else False
+
+    def close(self):
+        self.conn.close()
+
+    def retire(self):
+        self.retired = True
+        if not self.users:
+            self.conn.close()
+
+
+class SharedHTTPTransport(httpx.AsyncHTTPTransport):
+    """An HTTP transport shared by every client, closing a client leaves it open."""
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def aclose(self):
+        pass
+
+    async def close_pool(self):
+        await super().aclose()
+
+
+class ConnectionPool:
+    """Keeps idle SSH and HTTP connections to miners open, one pool per event loop."""
+
+    def __init__(self, idle_limit: int = 1000, idle_timeout: float = 60):
+        self.idle_limit = max(1, idle_limit)
+        self.idle_timeout = idle_timeout
+        self.ssh = OrderedDict()
+        self.connecting = {}
+        self.transports = {}
+        self.reaper = None
+
+    def transport(self, verify=pyasic_settings.ssl_cxt) -> SharedHTTPTransport:
+        if verify not in self.transports:
+            self.transports[verify] = SharedHTTPTransport(
+                verify=verify,
+                limits=httpx.Limits(
+                    max_connections=None,
+                    max_keepalive_connections=self.idle_limit,
+                    keepalive_expiry=self.idle_timeout,
+                ),
+            )
+        return self.transports[verify]
+
+    async def ssh_connection(
+        self, ssh: BaseSSH, connect: Callable[[], Awaitable]
+    ) -> PooledSSHConnection:
+        key = (str(ssh.ip), ssh.port, ssh.username, ssh.pwd)
+        pooled = self.ssh.get(key)
+        if pooled is not None and not pooled.closed:
+            self.ssh.move_to_end(key)
+            return pooled
+
+        # commands sent to one miner at once share a single handshake
+        task = self.connecting.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._connect(key, connect))
+            self.connecting[key] = task
+        return await asyncio.shield(task)
+
+    async def _connect(self, key: tuple, connect: Callable[[], Awaitable]):
+        try:
+            pooled = PooledSSHConnection(await connect())
+        finally:
+            self.connecting.pop(key, None)
+        old = self.ssh.pop(key, None)
+        if old is not None:
+            old.retire()
+        self.ssh[key] = pooled
+        self._evict()
+        if self.reaper is None:
+            self.reaper = asyncio.create_task(self._reap())
+        return pooled
+
+    def _evict(self):
+        # only idle connections count, the least recently used are closed first
+        idle = [key for key, pooled in self.ssh.items() if not pooled.users]
+        for key in idle[: max(0, len(idle) - self.idle_limit)]:
+            self.ssh.pop(key).close()
+
+    async def _reap(self):
+        try:
+            while self.ssh:
+                await asyncio.sleep(max(1.0, self.idle_timeout / 2))
+                now = time.monotonic()
+                for key, pooled in list(self.ssh.items()):
+                    if pooled.closed or (
+                        not pooled.users and now - pooled.last_used > self.idle_timeout
+                    ):
+                        self.ssh.pop(key).retire()
+        finally:
+            self.reaper = None
+
+    async def close(self):
+        if self.reaper is not None:
+            self.reaper.cancel()
+        for pooled in self.ssh.values():
+            pooled.close()
+        self.ssh.clear()
+        for transport in self.transports.values():
+            await transport.close_pool()
+        self.transports.clear()
+
+
+_POOLS = weakref.WeakKeyDictionary()
+
+
+def get_pool() -> ConnectionPool:
+    loop = asyncio.get_running_loop()
+    if loop not in _POOLS:
+        _POOLS[loop] = ConnectionPool(
+            settings.get("connection_idle_limit", 1000),
+            settings.get("connection_idle_timeout", 60),
+        )
+    return _POOLS[loop]
+
+
+def install_connection_pool():
+    """Send pyasic's SSH and HTTP connections through the connection pool."""
+    if not settings.get("connection_pool", True):
+        return
+    pyasic_settings.transport = _transport
+    BaseSSH._get_connection = _get_connection
+
+
+async def close_connections():
+    pool = _POOLS.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
+
+
+def _transport(verify=pyasic_settings.ssl_cxt):
+    try:
+        return get_pool().transport(verify)
+    except RuntimeError:
+        # no running loop to keep the connections on
+        return _open_transport(verify=verify)
+
+
+async def _get_connection(self: BaseSSH):
+    return await get_pool().ssh_connection(self, lambda: _open_ssh_connection(self))
@@ -0,0 +1,184 @@
+import asyncio
+import copy
+import time
+from typing import Any
+
+from pyasic.miners.data import DataOptions
+
+import settings
+
+ALL_OPTIONS = frozenset(str(option) for option in DataOptions)
+
+
+class _Flight:
+    """A get_data call in flight, `include` is None when it gets everything."""
+
+    def __init__(self, include: frozenset or None, task: asyncio.Task):
+        self.include = include
+        self.task = task
+        self.waiters = 0
+
+
+def _ttl(option: str) -> float:
+    return settings.get("data_ttls", {}).get(option, settings.get("data_ttl", 10))
+
+
+class _CachedData:
+    """The latest data from a miner, and when each of its fields was fetched."""
+
+    def __init__(self, data):
+        self.data = data
+        self.fetched = {}
+        self.expires = 0
+
+    def fresh(self, option: str, max_age: float or None) -> bool:
+        fetched = self.fetched.get(option)
+        if fetched is None:
+            return False
+        ttl = _ttl(option)
+        if max_age is not None:
+            ttl = min(ttl, max_age)
+        return time.monotonic() - fetched <= ttl
+
+    def update(self, data, options: frozenset):
+        now = time.monotonic()
+        for option in options:
+            value = getattr(data, option, None)
+            if value is not None:
+                setattr(self.data, option, value)
+                self.fetched[option] = now
+                self.expires = max(self.expires, now + _ttl(option))
+        self.data.raw_datetime = data.raw_datetime
+
+
+class DataFetcher:
+    """Gets data from miners, caching each field and sharing calls in flight."""
+
+    def __init__(self):
+        self.flights = {}
+        self.cache = {}
+        self.pruned = time.monotonic()
+
+    def invalidate(self, ip: Any):
+        self.cache.pop(str(ip), None)
+
+    def clear(self):
+        self.cache = {}
+
+    async def get_data(self, miner, include: list = None, max_age: float = None):
+        ip = str(miner.ip)
+        wanted = ALL_OPTIONS
+        if include is not None:
+            wanted = frozenset(str(option) for option in include) & ALL_OPTIONS
+        if not settings.get("data_cache", True):
+            return await self._fetch(miner, wanted)
+
+        self._prune()
+        entry = self.cache.get(ip)
+        if entry is not None:
+            wanted = frozenset(
+                option for option in wanted if not entry.fresh(option, max_age)
+            )
+            if not wanted:
+                return copy.copy(entry.data)
+
+        data = await self._fetch(miner, wanted)
+        # the miner may have been invalidated while fetching
+        entry = self.cache.get(ip)
+        if entry is None:
+            entry = self.cache[ip] = _CachedData(copy.copy(data))
+        entry.update(data, wanted)
+        return copy.copy(entry.data)
+
+    def _prune(self):
+        # checked at most once per data_ttl, as it goes through every miner
+        now = time.monotonic()
+        if now - self.pruned < settings.get("data_ttl", 10):
+            return
+        self.pruned = now
+        self.cache = {
+            ip: entry for ip, entry in self.cache.items() if entry.expires > now
+        }
+
+    async def _fetch(self, miner, wanted: frozenset):
+        ip = str(miner.ip)
+        if wanted >= ALL_OPTIONS:
+            wanted = None
+        flights = self.flights.setdefault(ip, [])
+
+        joined = [flight for flight in flights if flight.include is None]
+        if not joined and wanted is not None:
+            covered = set()
+            for flight in flights:
+                if flight.include & wanted:
+                    joined.append(flight)
+                    covered |= flight.include
+            missing = wanted - covered
+            if missing or not joined:
+                joined.append(self._start(miner, missing))
+        elif not joined:
+            joined.append(self._start(miner, None))
+
+        # count waiters now, so a caller cancelled meanwhile can't cancel the call
+        for flight in joined:
+            flight.waiters += 1
+        results = await asyncio.gather(*[self._wait(flight) for flight in joined])
+
+        data = copy.copy(results[0])
+        for flight, result in zip(joined[1:], results[1:]):
+            for option in flight.include:
+                value = getattr(result, option, None)
+                if value is not None:
+                    setattr(data, option, value)
+        return data
+
+    def _start(self, miner, include: frozenset or None) -> _Flight:
+        ip = str(miner.ip)
+        task = asyncio.create_task(
+            miner.get_data(include=None if include is None else list(include))
+        )
+        flight = _Flight(include, task)
+        self.flights[ip].append(flight)
+        task.add_done_callback(lambda _: self._finish(ip, flight))
+        return flight
+
+    def _finish(self, ip: str, flight: _Flight):
+        flights = self.flights.get(ip, [])
+        if flight in flights:
+            flights.remove(flight)
+        if not flights:
+            self.flights.pop(ip, None)
+
+    @staticmethod
+    async def _wait(flight: _Flight):
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                flight.task.cancel()
+
+
+DATA_FETCHER = DataFetcher()
+
+
+async def fetch_data(miner: Any, include: list = None, max_age: float = None):
+    """Get data from a miner, from the cache when it is fresh enough."""
+    return await DATA_FETCHER.get_data(miner, include, max_age)
+
+
+def got_data(data: Any, include: list = None) -> bool:
+    """Check the miner returned data, pyasic leaves what it failed to get as None."""
+    wanted = ALL_OPTIONS
+    if include is not None:
+        wanted = frozenset(str(option) for option in include) & ALL_OPTIONS
+    values = [getattr(data, option, None) for option in wanted]
+    # every miner reports a hashrate, other fields may be None on some models
+    if "hashrate" in wanted and getattr(data, "hashrate", None) is None:
+        return False
+    return not values or any(value is not None for value in values)
+
+
+def invalidate_data(ip: Any):
+    """Drop the cached data for a miner, i.e. after changing its config."""
+    DATA_FETCHER.invalidate(ip)
@@ -0,0 +1,145 @@
+import asyncio
+import importlib
+import json
+import logging
+import os
+from typing import Any, AsyncIterator
+
+from pyasic import settings as pyasic_settings
+from pyasic.miners.factory import miner_factory
+
+from upstream_config_util.fleet.pipeline import imap_unordered
+from upstream_config_util.fleet.probe import MINER_PORTS, probe
+import settings
+
+
+class IdentityCache:
+    """Remembers which pyasic class each miner resolved to, keyed by IP."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self.macs = {}
+        self.changed = False
+        try:
+            with open(path, "r") as cache_file:
+                self.entries = json.load(cache_file)
+        except (OSError, ValueError):
+            pass
+        for ip, entry in self.entries.items():
+            if entry.get("mac"):
+                self.macs[entry["mac"]] = ip
+
+    def __contains__(self, ip: Any) -> bool:
+        return str(ip) in self.entries
+
+    def add(self, miner, mac: str = None, fw_ver: str = None):
+        self.add_entry(str(miner.ip), class_path(miner), mac=mac, fw_ver=fw_ver)
+
+    def add_entry(self, ip: str, miner_class: str, mac: str = None, fw_ver: str = None):
+        entry = self.entries.get(ip, {})
+        new_entry = {
+            "class": miner_class,
+            "mac": _normalize_mac(mac) or entry.get("mac"),
+            "fw_ver": fw_ver or entry.get("fw_ver"),
+        }
+        if new_entry["mac"] != entry.get("mac"):
+            self.macs.pop(entry.get("mac"), None)
+        if new_entry["mac"]:
+            self.macs[new_entry["mac"]] = ip
+        if new_entry != entry:
+            self.entries[ip] = new_entry
+            self.changed = True
+
+    def remove(self, ip: Any):
+        entry = self.entries.pop(str(ip), None)
+        if entry is not None:
+            self.macs.pop(entry.get("mac"), None)
+            self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as cache_file:
+                json.dump(self.entries, cache_file, indent=1)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Failed to save miner cache: {e}")
+            return
+        self.changed = False
+
+    def build(self, ip: Any, entry: dict = None):
+        """Create a miner from its cached class without contacting it."""
+        entry = entry or self.entries.get(str(ip))
+        if entry is None:
+            return None
+        module, _, name = entry["class"].rpartition(".")
+        # only ever load miner classes from pyasic, whatever is in the file
+        if not module.startswith("pyasic."):
+            return None
+        try:
+            return getattr(importlib.import_module(module), name)(str(ip))
+        except (ImportError, AttributeError, TypeError):
+            return None
+
+    async def get_miner(self, ip: Any):
+        ip = str(ip)
+        miner = self.build(ip)
+        if miner is not None and not self.entries[ip].get("mac"):
+            ports = tuple(settings.get("probe_ports", MINER_PORTS))
+            if await probe(ip, ports, settings.get("probe_timeout", 0.5)):
+                return miner
+        elif miner is not None:
+            mac = await _get_mac(miner)
+            if mac is not None and mac == self.entries[ip]["mac"]:
+                return miner
+
+            # the address may have been handed to a miner that was seen elsewhere
+            moved_ip = self.macs.get(mac)
+            if moved_ip is not None and moved_ip != ip:
+                moved = self.entries[moved_ip]
+                miner = self.build(ip, moved)
+                if miner is not None:
+                    self.remove(moved_ip)
+                    self.add(miner, mac=mac, fw_ver=moved.get("fw_ver"))
+                    return miner
+
+        miner = await miner_factory.get_miner(ip)
+        if miner is not None:
+            self.add(miner)
+        else:
+            self.remove(ip)
+        return miner
+
+    def get_miner_generator(self, ips: list, limit: int = 200) -> AsyncIterator:
+        """Get miners, yielding None for each IP that did not resolve to one."""
+        return imap_unordered(self.get_miner, ips, workers=limit)
+
+
+def class_path(miner) -> str:
+    """The import path of a miner's class, which the cache builds it from."""
+    cls = type(miner)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def _normalize_mac(mac: str or None) -> str or None:
+    if not mac:
+        return None
+    return str(mac).upper().replace("-", ":")
+
+
+async def _get_mac(miner) -> str or None:
+    try:
+        return _normalize_mac(
+            await asyncio.wait_for(
+                miner.get_mac(),
+                timeout=pyasic_settings.get("factory_get_timeout", 3),
+            )
+        )
+    except Exception:
+        return None
+
+
+IDENTITY_CACHE = IdentityCache(os.path.join(settings.BASE_DIR, "miner_cache.json"))
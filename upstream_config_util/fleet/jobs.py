@@ -0,0 +1,131 @@
+import asyncio
+import copy
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+import toml
+
+from upstream_config_util.fleet.pipeline import merge
+from upstream_config_util.fleet.targets import parse_targets
+
+
+class ScanJob:
+    """A set of networks to scan together, with its own limits."""
+
+    def __init__(
+        self,
+        networks: list,
+        exclude: list = None,
+        name: str = None,
+        scan_threads: int = None,
+        ping_timeout: float = None,
+        ports: list = None,
+    ):
+        self.networks = networks
+        self.exclude = exclude or []
+        self.name = name or ", ".join(str(network) for network in networks)
+        self.scan_threads = scan_threads
+        self.ping_timeout = ping_timeout
+        self.ports = tuple(ports) if ports else None
+        self.hosts = parse_targets(
+            [*networks, *[f"!{network}" for network in self.exclude]]
+        )
+
+    def __len__(self) -> int:
+        return len(self.hosts)
+
+    def __repr__(self) -> str:
+        return f"ScanJob({self.name})"
+
+    def split(self, count: int) -> list:
+        """Split into `count` jobs with the same limits, each with a share of hosts."""
+        jobs = []
+        for hosts in self.hosts.split(count):
+            job = copy.copy(self)
+            job.hosts = hosts
+            jobs.append(job)
+        return jobs
+
+    def excluding(self, exclude: list) -> "ScanJob":
+        """A copy of the job that also leaves out the hosts in `exclude`."""
+        return ScanJob(
+            self.networks,
+            exclude=[*self.exclude, *exclude],
+            name=self.name,
+            scan_threads=self.scan_threads,
+            ping_timeout=self.ping_timeout,
+            ports=self.ports,
+        )
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScanJob":
+        networks = data.get("networks", data.get("network", []))
+        if isinstance(networks, str):
+            networks = networks.split(",")
+        exclude = data.get("exclude", [])
+        if isinstance(exclude, str):
+            exclude = exclude.split(",")
+        return cls(
+            networks,
+            exclude=exclude,
+            name=data.get("name"),
+            scan_threads=data.get("scan_threads"),
+            ping_timeout=data.get("ping_timeout"),
+            ports=data.get("probe_ports"),
+        )
+
+
+def load_scan_jobs(path: str) -> list:
+    """Load the [[scan_jobs]] tables from a toml file."""
+    with open(path, "r") as jobs_file:
+        data = toml.loads(jobs_file.read())
+    return [ScanJob.from_dict(job) for job in data.get("scan_jobs", [])]
+
+
+async def scan_job_generator(
+    job: ScanJob,
+    check: Callable[[Any, ScanJob], Awaitable],
+    budget: asyncio.Semaphore,
+    scan_threads: int = 300,
+) -> AsyncIterator:
+    """Scan the hosts of a job, yielding the result of `check` for each host."""
+    scan_threads = job.scan_threads or scan_threads
+    hosts = iter(job.hosts)
+    results = asyncio.Queue(maxsize=scan_threads)
+
+    async def worker():
+        for host in hosts:
+            async with budget:
+                try:
+                    result = await check(host, job)
+                except Exception as e:
+                    logging.warning(f"{host}: Failed to check host: {e}")
+                    result = None
+            await results.put(result)
+
+    workers = [
+        asyncio.create_task(worker()) for _ in range(min(scan_threads, len(job)))
+    ]
+    try:
+        for _ in range(len(job)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+
+def scan_jobs_generator(
+    jobs: list,
+    check: Callable[[Any, ScanJob], Awaitable],
+    budget: int = 300,
+    scan_threads: int = 300,
+) -> AsyncIterator:
+    """Run several scan jobs at once under one global concurrency budget."""
+    semaphore = asyncio.Semaphore(budget)
+    return merge(
+        *[
+            scan_job_generator(job, check, semaphore, scan_threads=scan_threads)
+            for job in jobs
+        ]
+    )
@@ -0,0 +1,185 @@
+import asyncio
+import logging
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable
+
+
+class StageStats:
+    """Counts items through a pipeline stage and the rate they went through at."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.started = None
+        self.finished = None
+
+    def add(self, count: int = 1):
+        if self.started is None:
+            self.started = time.monotonic()
+        self.count += count
+        self.finished = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        if self.started is None or self.finished == self.started:
+            return 0.0
+        return self.count / (self.finished - self.started)
+
+    def __str__(self) -> str:
+        return f"{self.name}: {self.count} ({self.rate:.1f}/s)"
+
+
+class Pipeline:
+    """Feeds items from a discovery stage to a fixed pool of workers."""
+
+    def __init__(
+        self,
+        discover: AsyncIterable,
+        process: Callable[[Any], Awaitable],
+        workers: int = 300,
+        queue_size: int = 1000,
+        cancel_timeout: float = 5,
+    ):
+        self.discover = discover
+        self.process = process
+        self.workers = max(1, workers)
+        self.queue = asyncio.Queue(maxsize=max(1, queue_size))
+        self.cancel_timeout = cancel_timeout
+        self.discovered = StageStats("discovered")
+        self.processed = StageStats("processed")
+        self.max_queued = 0
+        self.cancelled = False
+        self.dropped = 0
+        self.aborted = 0
+
+    @property
+    def stats(self) -> list:
+        return [self.discovered, self.processed]
+
+    def summary(self) -> str:
+        summary = ", ".join(str(stage) for stage in self.stats)
+        if self.cancelled:
+            summary += f", dropped: {self.dropped}, aborted: {self.aborted}"
+        return summary
+
+    async def run(self):
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        discovery = asyncio.create_task(self._discover())
+        try:
+            await discovery
+            await self.queue.join()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            discovery.cancel()
+            await asyncio.gather(discovery, return_exceptions=True)
+            self._drop_queued()
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout=self.cancel_timeout)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            logging.info(f"{self.summary()}, max queued: {self.max_queued}")
+
+    async def _discover(self):
+        try:
+            async for item in self.discover:
+                await self.queue.put(item)
+                self.discovered.add()
+                self.max_queued = max(self.max_queued, self.queue.qsize())
+        finally:
+            # close the discovery generators, even if they are waiting on a put
+            aclose = getattr(self.discover, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def _drop_queued(self):
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.dropped += 1
+
+    async def _worker(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                await self.process(item)
+            except asyncio.CancelledError:
+                self.aborted += 1
+                raise
+            except Exception as e:
+                # one bad item should not take a worker down with it
+                logging.error(f"{item}: {e}")
+            finally:
+                self.queue.task_done()
+            self.processed.add()
+
+
+async def merge(*iterables: AsyncIterable) -> AsyncIterator:
+    """Yield items from several async iterables as soon as any of them has one."""
+    queue = asyncio.Queue()
+    done = object()
+
+    async def drain(iterable):
+        try:
+            async for item in iterable:
+                await queue.put(item)
+        except Exception as e:
+            logging.error(f"{iterable}: {e}")
+        finally:
+            queue.put_nowait(done)
+
+    tasks = [asyncio.create_task(drain(iterable)) for iterable in iterables]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item = await queue.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def iterate(items: Iterable) -> AsyncIterator:
+    """Yield the items of a regular iterable, i.e. to feed them to a Pipeline."""
+    for item in items:
+        yield item
+
+
+async def imap_unordered(
+    func: Callable[[Any], Awaitable], items: Iterable, workers: int = 300
+) -> AsyncIterator:
+    """Yield `func(item)` for each item as it finishes, None if it raised."""
+    items = iter(items)
+    results = asyncio.Queue(maxsize=max(1, workers))
+    done = object()
+
+    async def worker():
+        for item in items:
+            try:
+                result = await func(item)
+            except Exception as e:
+                logging.error(f"{item}: {e}")
+                result = None
+            await results.put(result)
+        await results.put(done)
+
+    tasks = [asyncio.create_task(worker()) for _ in range(max(1, workers))]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            result = await results.get()
+            if result is done:
+                remaining -= 1
+            else:
+                yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any
+
+# ports miners answer on: the cgminer style API, web interfaces and SSH
+MINER_PORTS = (4028, 80, 443, 22)
+
+
+async def probe(ip: Any, ports: tuple = MINER_PORTS, timeout: float = 0.5) -> bool:
+    """Check if anything accepts a connection on any of the ports."""
+    tasks = [asyncio.create_task(_connect(str(ip), port, timeout)) for port in ports]
+    try:
+        for task in asyncio.as_completed(tasks):
+            if await task:
+                return True
+        return False
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _connect(ip: str, port: int, timeout: float) -> bool:
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(ip, port), timeout=timeout
+        )
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
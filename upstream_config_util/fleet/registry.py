@@ -0,0 +1,76 @@
+import time
+from typing import Any, Tuple
+
+from pyasic.miners.factory import miner_factory
+
+from upstream_config_util.fleet.identity import IDENTITY_CACHE
+from upstream_config_util.fleet.pipeline import imap_unordered
+import settings
+
+
+class MinerRegistry:
+    """The miners identified this session, keyed by IP."""
+
+    def __init__(self, ttl: float = 1800):
+        self.ttl = ttl
+        self.miners = {}
+
+    def __contains__(self, ip: Any) -> bool:
+        return self.get(ip) is not None
+
+    def add(self, miner):
+        if miner is not None:
+            self.miners[str(miner.ip)] = (miner, time.monotonic() + self.ttl)
+
+    def get(self, ip: Any):
+        entry = self.miners.get(str(ip))
+        if entry is None:
+            return None
+        miner, expires = entry
+        if time.monotonic() > expires:
+            del self.miners[str(ip)]
+            return None
+        return miner
+
+    def invalidate(self, ip: Any):
+        self.miners.pop(str(ip), None)
+
+    def clear(self):
+        self.miners = {}
+
+    async def identify(self, ip: Any):
+        """Identify a miner again, skipping the registry."""
+        if settings.get("fast_rescan", False) and ip in IDENTITY_CACHE:
+            miner = await IDENTITY_CACHE.get_miner(ip)
+        else:
+            miner = await miner_factory.get_miner(str(ip))
+        self.add(miner)
+        return miner
+
+    async def get_miner(self, ip: Any):
+        miner = self.get(ip)
+        if miner is None:
+            miner = await self.identify(ip)
+        return miner
+
+    async def get_miners(self, ips: list) -> Tuple[list, list]:
+        """Get the miners for the IPs in order, and the IPs that weren't identified."""
+        miners = {}
+        missing = []
+        for ip in ips:
+            miner = self.get(ip)
+            if miner is None:
+                missing.append(ip)
+            else:
+                miners[str(ip)] = miner
+        if missing:
+            limit = settings.get("scan_threads", 300)
+            async for miner in imap_unordered(self.identify, missing, limit):
+                if miner is not None:
+                    miners[str(miner.ip)] = miner
+        found = [miners[str(ip)] for ip in ips if str(ip) in miners]
+        unresolved = [ip for ip in ips if str(ip) not in miners]
+        return found, unresolved
+
+
+MINER_REGISTRY = MinerRegistry(settings.get("miner_ttl", 1800))
@@ -0,0 +1,74 @@
+import contextvars
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from pyasic import settings as pyasic_settings
+from pyasic.miners.factory import miner_factory
+from pyasic.network import MinerNetwork
+
+from upstream_config_util.fleet.identity import IDENTITY_CACHE
+from upstream_config_util.fleet.jobs import ScanJob, scan_jobs_generator
+from upstream_config_util.fleet.pipeline import Pipeline, iterate
+from upstream_config_util.fleet.probe import MINER_PORTS, probe
+import settings
+
+
+def scan_jobs(jobs: list) -> AsyncIterator:
+    """Scan the hosts of the jobs, yielding a miner or None for each host."""
+    scan_probe = settings.get("scan_probe", False)
+    scan_threads = settings.get("probe_threads" if scan_probe else "scan_threads", 300)
+    return scan_jobs_generator(
+        jobs, host_checker(), budget=scan_threads, scan_threads=scan_threads
+    )
+
+
+def host_checker() -> Callable[[Any, ScanJob], Awaitable]:
+    fast_rescan = settings.get("fast_rescan", False)
+    scan_probe = settings.get("scan_probe", False)
+    network = MinerNetwork([])
+
+    async def check(host, job: ScanJob):
+        # miners seen before are built from the cache
+        if fast_rescan and host in IDENTITY_CACHE:
+            return await IDENTITY_CACHE.get_miner(host)
+
+        # jobs with their own timeout are always probed, pyasic's is global
+        if scan_probe or job.ping_timeout is not None:
+            ports = job.ports or tuple(settings.get("probe_ports", MINER_PORTS))
+            timeout = job.ping_timeout or settings.get("probe_timeout", 0.5)
+            if not await probe(host, ports, timeout):
+                return None
+            return await miner_factory.get_miner(str(host))
+        return await network.ping_and_get_miner(host)
+
+    return check
+
+
+# pyasic settings changed only for the tasks started while they are set
+_PYASIC_OVERRIDES = contextvars.ContextVar("pyasic_overrides", default={})
+_pyasic_get = pyasic_settings.get
+
+
+def _get_pyasic_setting(key: str, other: Any = None) -> Any:
+    overrides = _PYASIC_OVERRIDES.get()
+    if key in overrides:
+        return overrides[key]
+    return _pyasic_get(key, other)
+
+
+async def retry_pass(miners: list, process: Callable[[Any], Awaitable]) -> Pipeline:
+    """Run `process` again on failed miners, with fewer workers and a longer timeout."""
+    pyasic_settings.get = _get_pyasic_setting
+    token = _PYASIC_OVERRIDES.set(
+        {"api_function_timeout": settings.get("retry_timeout", 15)}
+    )
+    try:
+        pipeline = Pipeline(
+            iterate(miners),
+            process,
+            workers=settings.get("retry_threads", 20),
+            cancel_timeout=0,
+        )
+        await pipeline.run()
+    finally:
+        _PYASIC_OVERRIDES.reset(token)
+    return pipeline
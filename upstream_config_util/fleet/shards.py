@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import time
+from typing import AsyncIterator
+
+from pyasic import APIError
+
+from upstream_config_util.fleet.connections import (
+    close_connections,
+    install_connection_pool,
+)
+from upstream_config_util.fleet.fetch import fetch_data, got_data
+from upstream_config_util.fleet.identity import class_path
+from upstream_config_util.fleet.pipeline import Pipeline
+from upstream_config_util.fleet.scanner import retry_pass, scan_jobs
+import settings
+
+
+async def sharded_scan(jobs: list, shards: int, include: list = None) -> AsyncIterator:
+    """Scan the jobs across worker processes, each with its own event loop."""
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    shard_jobs = [[] for _ in range(shards)]
+    for job in jobs:
+        for idx, shard in enumerate(job.split(shards)):
+            if len(shard):
+                shard_jobs[idx].append(shard)
+    workers = [
+        context.Process(
+            target=_scan_shard,
+            args=(
+                shard,
+                include,
+                results,
+                settings.get("shard_batch_size", 100),
+                settings.get("shard_batch_interval", 0.5),
+            ),
+            daemon=True,
+        )
+        for shard in shard_jobs
+        if shard
+    ]
+    for worker in workers:
+        worker.start()
+
+    running = len(workers)
+    try:
+        while running:
+            try:
+                message = results.get_nowait()
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    if results.empty():
+                        logging.error("Scan workers exited without finishing")
+                        return
+                await asyncio.sleep(0.05)
+                continue
+            if message is None:
+                running -= 1
+            else:
+                yield message
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        # wait for the workers to exit without blocking the event loop
+        deadline = time.monotonic() + 1
+        while any(worker.is_alive() for worker in workers):
+            if time.monotonic() > deadline:
+                break
+            await asyncio.sleep(0.05)
+        results.close()
+
+
+def _scan_shard(jobs: list, include: list, results, batch_size: int, interval: float):
+    """Entry point of a worker process, always ends with a None on `results`."""
+    install_connection_pool()
+    try:
+        asyncio.run(_run_shard(jobs, include, results, batch_size, interval))
+    except Exception as e:
+        logging.error(f"Scan worker failed: {e}")
+    finally:
+        results.put(None)
+
+
+async def _run_shard(
+    jobs: list, include: list, results, batch_size: int, interval: float
+):
+    batch = []
+    scanned = 0
+    sent = time.monotonic()
+    failed = {}
+
+    def send():
+        nonlocal batch, scanned, sent
+        if batch or scanned:
+            results.put((scanned, batch))
+        batch, scanned, sent = [], 0, time.monotonic()
+
+    async def discover(scan_generator):
+        nonlocal scanned
+        try:
+            async for miner in scan_generator:
+                scanned += 1
+                if miner is not None:
+                    yield miner
+                if time.monotonic() - sent > interval:
+                    send()
+        finally:
+            await scan_generator.aclose()
+
+    async def get_data(miner):
+        try:
+            data = await fetch_data(miner, include=include)
+            if not got_data(data, include):
+                raise APIError("No data returned from the miner.")
+        except Exception:
+            failed[str(miner.ip)] = miner
+            return
+        failed.pop(str(miner.ip), None)
+        batch.append((data.asdict(), class_path(miner)))
+        if len(batch) >= batch_size or time.monotonic() - sent > interval:
+            send()
+
+    pipeline = Pipeline(
+        discover(scan_jobs(jobs)),
+        get_data,
+        workers=settings.get("data_threads", 300),
+        queue_size=settings.get("scan_queue_size", 1000),
+    )
+    await pipeline.run()
+    if failed and settings.get("scan_retry", True):
+        await retry_pass(list(failed.values()), get_data)
+
+    batch.extend(({"ip": ip}, None) for ip in failed)
+    send()
+    await close_connections()
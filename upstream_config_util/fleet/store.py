@@ -0,0 +1,270 @@
+import sys
+from array import array
+from fractions import Fraction
+from typing import Any, Iterator
+
+# cell states for numeric columns, kept in a bytearray next to each column
+MISSING, NONE, SET, RAW = range(4)
+
+_MISSING = object()
+
+
+def _pool(group: int, idx: int, key: str):
+    return lambda x: x["config"]["pools"]["groups"][group]["pools"][idx][key]
+
+
+def _board(idx: int):
+    return lambda x: x["hashboards"][idx]["chips"]
+
+
+def _hashboards(x):
+    return tuple(
+        (board.get("chips"), board.get("expected_chips")) for board in x["hashboards"]
+    )
+
+
+def _errors(x):
+    return tuple(
+        (err.get("error_code"), err.get("error_message")) for err in x["errors"]
+    )
+
+
+# field: (column type, source key in MinerData.asdict(), extractor)
+#   "f" - float, "i" - int, "?" - bool, stored in arrays
+#   "s" - interned string, "t" - plain string, "o" - python object, stored in lists
+FIELDS = {
+    "model": ("s", "model", lambda x: x["model"]),
+    "hostname": ("t", "hostname", lambda x: x["hostname"]),
+    "fw_ver": ("s", "fw_ver", lambda x: x["fw_ver"]),
+    "hashrate": ("f", "hashrate", lambda x: x["hashrate"]),
+    "expected_hashrate": ("f", "expected_hashrate", lambda x: x["expected_hashrate"]),
+    "temperature_avg": ("f", "temperature_avg", lambda x: x["temperature_avg"]),
+    "wattage": ("i", "wattage", lambda x: x["wattage"]),
+    "wattage_limit": ("i", "wattage_limit", lambda x: x["wattage_limit"]),
+    "expected_chips": ("i", "expected_chips", lambda x: x["expected_chips"]),
+    "total_chips": ("i", "total_chips", lambda x: x["total_chips"]),
+    "nominal": ("?", "nominal", lambda x: x["nominal"]),
+    "percent_expected_chips": (
+        "f",
+        "percent_expected_chips",
+        lambda x: x["percent_expected_chips"],
+    ),
+    "board_1_chips": ("i", "hashboards", _board(0)),
+    "board_2_chips": ("i", "hashboards", _board(1)),
+    "board_3_chips": ("i", "hashboards", _board(2)),
+    "board_4_chips": ("i", "hashboards", _board(3)),
+    "hashboards": ("o", "hashboards", _hashboards),
+    "pool_split": (
+        "s",
+        "config",
+        lambda x: x["config"]["pools"]["groups"][0]["quota"],
+    ),
+    "pool_1_url": ("s", "config", _pool(0, 0, "url")),
+    "pool_1_user": ("s", "config", _pool(0, 0, "user")),
+    "pool_2_url": ("s", "config", _pool(0, 1, "url")),
+    "pool_2_user": ("s", "config", _pool(0, 1, "user")),
+    "pool_3_url": ("s", "config", _pool(0, 2, "url")),
+    "pool_3_user": ("s", "config", _pool(0, 2, "user")),
+    "errors": ("o", "errors", _errors),
+    "fault_light": ("?", "fault_light", lambda x: x["fault_light"]),
+    "output": ("t", "output", lambda x: x["output"]),
+}
+
+# fields with a running total kept across the whole store
+TOTAL_FIELDS = ("hashrate", "expected_hashrate", "wattage", "wattage_limit")
+
+ARRAY_TYPES = {"f": "d", "i": "q", "?": "b"}
+CASTS = {"f": float, "i": int, "?": bool}
+
+# fields to refresh when a given key shows up in an update
+SOURCES = {}
+for _field, (_, _source, _) in FIELDS.items():
+    SOURCES.setdefault(_source, []).append(_field)
+
+
+class MinerRecord:
+    """A dict-like view of one miner's row in a FleetStore."""
+
+    __slots__ = ("store", "row")
+
+    def __init__(self, store: "FleetStore", row: int):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.store.get_value(self.row, key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: str) -> bool:
+        return self.store.get_value(self.row, key) is not _MISSING
+
+    def get(self, key: str, other: Any = None) -> Any:
+        value = self.store.get_value(self.row, key)
+        if value is _MISSING:
+            return other
+        return value
+
+    def keys(self) -> list:
+        return ["ip", *[field for field in FIELDS if field in self]]
+
+    def as_dict(self) -> dict:
+        """Rebuild the parts of MinerData.asdict() the reports need."""
+        data = {key: self[key] for key in self.keys()}
+        if "hashboards" in data:
+            data["hashboards"] = [
+                {"chips": chips, "expected_chips": expected_chips}
+                for chips, expected_chips in data["hashboards"]
+            ]
+        if "errors" in data:
+            data["errors"] = [
+                {"error_code": code, "error_message": message}
+                for code, message in data["errors"]
+            ]
+        return data
+
+
+class FleetStore:
+    """Columnar storage for miner data."""
+
+    def __init__(self):
+        self.index = {}
+        self.ips = []
+        self.columns = {}
+        self.states = {}
+        # values that did not fit their column type, keyed by (field, row)
+        self.raw = {}
+        # fractions keep the totals exact no matter how many deltas are applied
+        self.totals = {field: Fraction(0) for field in TOTAL_FIELDS}
+        for field, (kind, _, _) in FIELDS.items():
+            if kind in ARRAY_TYPES:
+                self.columns[field] = array(ARRAY_TYPES[kind])
+                self.states[field] = bytearray()
+            else:
+                self.columns[field] = []
+
+    def __len__(self) -> int:
+        return len(self.ips)
+
+    def __contains__(self, ip: str) -> bool:
+        return ip in self.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.ips)
+
+    def __getitem__(self, ip: str) -> MinerRecord:
+        return MinerRecord(self, self.index[ip])
+
+    def keys(self) -> list:
+        return self.ips
+
+    def total(self, field: str) -> float:
+        return float(self.totals[field])
+
+    def selected_totals(self, rows: set) -> dict:
+        """Sum the total fields over a set of store rows in one pass."""
+        if len(rows) == len(self.ips):
+            return {field: self.total(field) for field in TOTAL_FIELDS}
+        columns = [(self.columns[field], self.states[field]) for field in TOTAL_FIELDS]
+        totals = [0] * len(columns)
+        for row in rows:
+            for idx, (column, states) in enumerate(columns):
+                if states[row] == SET:
+                    totals[idx] += column[row]
+        return dict(zip(TOTAL_FIELDS, totals))
+
+    def items(self) -> Iterator:
+        for ip, row in self.index.items():
+            yield ip, MinerRecord(self, row)
+
+    def add(self, ip: str) -> int:
+        if ip in self.index:
+            return self.index[ip]
+        row = len(self.ips)
+        self.index[ip] = row
+        self.ips.append(ip)
+        for field, column in self.columns.items():
+            if field in self.states:
+                column.append(0)
+                self.states[field].append(MISSING)
+            else:
+                column.append(_MISSING)
+        return row
+
+    def get_value(self, row: int, field: str) -> Any:
+        if field == "ip":
+            return self.ips[row]
+        if field not in self.columns:
+            return _MISSING
+        if field not in self.states:
+            return self.columns[field][row]
+        state = self.states[field][row]
+        if state == SET:
+            value = self.columns[field][row]
+            if FIELDS[field][0] == "?":
+                return bool(value)
+            return value
+        if state == NONE:
+            return None
+        if state == RAW:
+            return self.raw[(field, row)]
+        return _MISSING
+
+    def set_value(self, row: int, field: str, value: Any) -> bool:
+        """Set a cell, returning whether the stored value changed."""
+        kind = FIELDS[field][0]
+        # compare what would be stored, so a cast alone doesn't count as a change
+        if field in self.states and value is not None and value is not _MISSING:
+            try:
+                value = CASTS[kind](value)
+            except (TypeError, ValueError, OverflowError):
+                pass
+        if self.get_value(row, field) == value:
+            return False
+
+        if field in self.totals:
+            self._add_total(row, field, -1)
+        self.raw.pop((field, row), None)
+        if field not in self.states:
+            if kind == "s" and isinstance(value, str):
+                value = sys.intern(value)
+            self.columns[field][row] = value
+            return True
+
+        if value is _MISSING:
+            self.states[field][row] = MISSING
+        elif value is None:
+            self.states[field][row] = NONE
+        else:
+            try:
+                self.columns[field][row] = CASTS[kind](value)
+                self.states[field][row] = SET
+            except (TypeError, ValueError, OverflowError):
+                self.raw[(field, row)] = value
+                self.states[field][row] = RAW
+        if field in self.totals:
+            self._add_total(row, field, 1)
+        return True
+
+    def _add_total(self, row: int, field: str, sign: int):
+        if self.states[field][row] == SET:
+            self.totals[field] += sign * Fraction(self.columns[field][row])
+
+    def update(self, ip: str, data: dict) -> bool:
+        """Merge a MinerData.asdict() style dict into the store."""
+        row = self.add(ip)
+        changed = False
+        for key in data:
+            for field in SOURCES.get(key, []):
+                try:
+                    value = FIELDS[field][2](data)
+                except (LookupError, TypeError):
+                    value = _MISSING
+                changed = self.set_value(row, field, value) or changed
+        return changed
+
+    def clear(self, ip: str):
+        row = self.add(ip)
+        for field in self.columns:
+            self.set_value(row, field, _MISSING)
@@ -0,0 +1,141 @@
+import ipaddress
+from bisect import bisect_right
+from itertools import product
+from typing import Iterable, Iterator
+
+
+class IPRangeSet:
+    """A set of IPv4 addresses stored as sorted, non-overlapping ranges."""
+
+    __slots__ = ("ranges", "size")
+
+    def __init__(self, ranges: Iterable = ()):
+        merged = []
+        for start, end in sorted(ranges):
+            if start >= end:
+                continue
+            if merged and start <= merged[-1][1]:
+                if end > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], end)
+            else:
+                merged.append((start, end))
+        self.ranges = merged
+        self.size = sum(end - start for start, end in merged)
+
+    @classmethod
+    def from_subnet(cls, subnet: str, hosts: bool = True) -> "IPRangeSet":
+        """The usable hosts of a subnet, such as `"10.0.0.0/24"`."""
+        network = ipaddress.IPv4Network(subnet, strict=False)
+        start = int(network.network_address)
+        end = start + network.num_addresses
+        # like ip_network().hosts(), skip the network and broadcast addresses
+        if hosts and network.prefixlen < 31:
+            start, end = start + 1, end - 1
+        return cls([(start, end)])
+
+    @classmethod
+    def from_address(cls, address: str) -> "IPRangeSet":
+        """An address constructor, such as `"10.1-2.1.1-50"` or `"10.0.0.1"`."""
+        octets = address.split(".")
+        if not len(octets) == 4:
+            raise ValueError(f"Invalid IP constructor: {address}")
+        bounds = [_octet_range(octet) for octet in octets]
+        last_start, last_end = bounds[-1]
+        ranges = []
+        for first, second, third in product(*[range(s, e + 1) for s, e in bounds[:3]]):
+            base = (first << 24) | (second << 16) | (third << 8)
+            ranges.append((base + last_start, base + last_end + 1))
+        return cls(ranges)
+
+    @classmethod
+    def from_target(cls, target: str, hosts: bool = True) -> "IPRangeSet":
+        if "/" in target:
+            return cls.from_subnet(target, hosts=hosts)
+        return cls.from_address(target)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def __iter__(self) -> Iterator[ipaddress.IPv4Address]:
+        for start, end in self.ranges:
+            for ip in range(start, end):
+                yield ipaddress.IPv4Address(ip)
+
+    def __contains__(self, ip) -> bool:
+        try:
+            ip = int(ipaddress.IPv4Address(ip))
+        except ValueError:
+            return False
+        idx = bisect_right(self.ranges, (ip, float("inf"))) - 1
+        return idx >= 0 and self.ranges[idx][0] <= ip < self.ranges[idx][1]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, IPRangeSet) and self.ranges == other.ranges
+
+    def __repr__(self) -> str:
+        return f"IPRangeSet({len(self.ranges)} ranges, {self.size} addresses)"
+
+    def union(self, other: "IPRangeSet") -> "IPRangeSet":
+        return IPRangeSet([*self.ranges, *other.ranges])
+
+    def difference(self, other: "IPRangeSet") -> "IPRangeSet":
+        ranges = []
+        other_ranges = other.ranges
+        idx = 0
+        for start, end in self.ranges:
+            # skip the ranges that end before this one starts
+            while idx < len(other_ranges) and other_ranges[idx][1] <= start:
+                idx += 1
+            cut = idx
+            while cut < len(other_ranges) and other_ranges[cut][0] < end:
+                cut_start, cut_end = other_ranges[cut]
+                if cut_start > start:
+                    ranges.append((start, cut_start))
+                start = max(start, cut_end)
+                if cut_end > end:
+                    break
+                cut += 1
+            if start < end:
+                ranges.append((start, end))
+        return IPRangeSet(ranges)
+
+    def split(self, count: int, block: int = 256) -> list:
+        """Split into `count` sets of about the same size."""
+        shards = [[] for _ in range(max(1, count))]
+        idx = 0
+        for start, end in self.ranges:
+            while start < end:
+                stop = min(end, start + block)
+                shards[idx % len(shards)].append((start, stop))
+                idx += 1
+                start = stop
+        return [IPRangeSet(ranges) for ranges in shards]
+
+    __or__ = union
+    __sub__ = difference
+
+
+def _octet_range(octet: str) -> tuple:
+    bounds = [int(value) for value in octet.split("-")]
+    if not 1 <= len(bounds) <= 2 or not all(0 <= value <= 255 for value in bounds):
+        raise ValueError(f"Invalid octet: {octet}")
+    return min(bounds), max(bounds)
+
+
+def parse_targets(targets: Iterable) -> IPRangeSet:
+    """Parse targets into one IPRangeSet, targets starting with "!" are excluded."""
+    included = []
+    excluded = []
+    for target in targets:
+        target = str(target).replace(" ", "")
+        if not target:
+            continue
+        if target.startswith("!"):
+            # exclusions cover whole subnets
+            excluded.extend(IPRangeSet.from_target(target[1:], hosts=False).ranges)
+        else:
+            included.extend(IPRangeSet.from_target(target).ranges)
+    return IPRangeSet(included) - IPRangeSet(excluded)
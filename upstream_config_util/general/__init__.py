@@ -1,8 +1,14 @@
 import asyncio
+import logging
 import webbrowser
 
+from pyasic import APIError
 from pyasic.miners.factory import miner_factory
 from upstream_config_util.decorators import disable_buttons
+from upstream_config_util.fleet.fetch import fetch_data
+from upstream_config_util.fleet.identity import IDENTITY_CACHE
+from upstream_config_util.fleet.pipeline import Pipeline, imap_unordered
+from upstream_config_util.fleet.registry import MINER_REGISTRY
 from upstream_config_util.layout import TABLE_KEYS
 from upstream_config_util.layout import window, update_prog_bar, TABLE_HEADERS
 from upstream_config_util import tables
@@ -21,11 +27,9 @@ for t in TABLE_HEADERS:
 def btn_all(table, selected):
     if table in TABLE_KEYS["table"]:
         if len(selected) == len(window[table].Values):
-            window[table].update(select_rows=())
+            tables.select_rows(table, [])
         else:
-            window[table].update(
-                select_rows=([row for row in range(len(window[table].Values))])
-            )
+            tables.select_rows(table, [row for row in range(len(window[table].Values))])
 
     if table in TABLE_KEYS["tree"]:
         if len(selected) == len(window[table].Widget.get_children()):
@@ -57,20 +61,57 @@ async def update_miners_data(miners: list):
         tables.clear_item(ip)
     tables.update_tables([{"ip": str(miner)} for miner in miners])
 
+    # each miner counts twice, once identified and once it has data
     global progress_bar_len
     progress_bar_len = 0
-    await update_prog_bar(progress_bar_len, _max=len(miners))
-    _miners = []
-    async for miner in miner_factory.get_miner_generator(miners):
-        _miners.append(miner)
-
-    data_generator = asyncio.as_completed([_get_data(miner) for miner in _miners])
-    for all_data in data_generator:
-        data = await all_data
-        tables.update_item(data)
-        progress_bar_len += 1
-        await update_prog_bar(progress_bar_len)
+    await update_prog_bar(progress_bar_len, _max=(2 * len(miners)))
+
+    # get data from each miner as soon as it is identified
+    pipeline = Pipeline(
+        _identify_miners(miners),
+        _get_miner_data,
+        workers=settings.get("data_threads", 300),
+        queue_size=settings.get("scan_queue_size", 1000),
+        cancel_timeout=settings.get("scan_cancel_timeout", 5),
+    )
+    await pipeline.run()
+    tables.flush_tables()
+    IDENTITY_CACHE.save()
+
+
+async def _identify_miners(miners: list):
+    global progress_bar_len
 
+    limit = settings.get("scan_threads", 300)
+    if settings.get("fast_rescan", False):
+        miner_generator = IDENTITY_CACHE.get_miner_generator(miners, limit=limit)
+    else:
+        miner_generator = imap_unordered(miner_factory.get_miner, miners, limit)
+
+    try:
+        async for miner in miner_generator:
+            # miners that were not found have no data to wait for
+            progress_bar_len += 1 if miner is not None else 2
+            await update_prog_bar(progress_bar_len)
+            if miner is not None:
+                MINER_REGISTRY.add(miner)
+                yield miner
+    finally:
+        await miner_generator.aclose()
+
+
+async def _get_miner_data(miner):
+    global progress_bar_len
+
+    try:
+        # refreshes are asked for, so they skip the cache
+        data = await fetch_data(miner, include=settings.get("include"), max_age=0)
+        data = data.asdict()
+        tables.update_item(data)
+        IDENTITY_CACHE.add(miner, mac=data.get("mac"), fw_ver=data.get("fw_ver"))
+    except (APIError, asyncio.TimeoutError, OSError) as e:
+        logging.warning(f"{miner.ip}: Failed to get data: {e}")
+        MINER_REGISTRY.invalidate(miner.ip)
 
-async def _get_data(miner):
-    return (await miner.get_data(include=settings.get("include"))).asdict()
+    progress_bar_len += 1
+    await update_prog_bar(progress_bar_len)
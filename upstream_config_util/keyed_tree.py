@@ -0,0 +1,69 @@
+import tkinter as tk
+
+
+class KeyedTree:
+    """Keeps the items of a tree element keyed by the first value of each row."""
+
+    def __init__(self, element):
+        self.element = element
+        self.widget = element.Widget
+        self.order = []
+        # (text, values, icon) of each item as it was last written to Tk
+        self.items = {}
+
+    def set_rows(self, rows: list):
+        """Set the rows of the tree from a list of (text, values, icon) tuples."""
+        keys = [values[0] for _, values, _ in rows]
+
+        removed = self.items.keys() - set(keys)
+        if removed:
+            self.widget.delete(*removed)
+            for key in removed:
+                del self.items[key]
+                self.element.IdToKey.pop(key, None)
+                self.element.KeyToID.pop(key, None)
+            self.order = [key for key in self.order if key not in removed]
+
+        for text, values, icon in rows:
+            key = values[0]
+            old = self.items.get(key)
+            if old is None:
+                self.widget.insert(
+                    "",
+                    "end",
+                    iid=key,
+                    text=text,
+                    values=values,
+                    image=self._photo(icon),
+                )
+                self.element.IdToKey[key] = key
+                self.element.KeyToID[key] = key
+                self.order.append(key)
+            elif old != (text, values, icon):
+                changes = {}
+                if old[0] != text:
+                    changes["text"] = text
+                if old[1] != values:
+                    changes["values"] = values
+                # only swap the icon when it actually changed
+                if old[2] != icon:
+                    changes["image"] = self._photo(icon)
+                self.widget.item(key, **changes)
+            self.items[key] = (text, values, icon)
+
+        # move items from the first one that is out of place
+        for first, (old_key, key) in enumerate(zip(self.order, keys)):
+            if old_key != key:
+                for idx in range(first, len(keys)):
+                    self.widget.move(keys[idx], "", idx)
+                break
+        self.order = keys
+
+    def clear(self):
+        self.set_rows([])
+
+    def _photo(self, icon: bytes):
+        # share the images FreeSimpleGUI caches for the element
+        if icon not in self.element.image_dict:
+            self.element.image_dict[icon] = tk.PhotoImage(data=icon)
+        return self.element.image_dict[icon]
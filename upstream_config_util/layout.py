@@ -501,6 +501,7 @@ def get_pools_layout():
                                 ]
                             ],
                             pad=TAB_PAD,
+                            key="pools_all_tab",
                         )
                     ],
                     [
@@ -535,6 +536,7 @@ def get_pools_layout():
                                     )
                                 ]
                             ],
+                            key="pools_1_tab",
                         )
                     ],
                     [
@@ -569,6 +571,7 @@ def get_pools_layout():
                                     )
                                 ]
                             ],
+                            key="pools_2_tab",
                         )
                     ],
                     [
@@ -603,6 +606,7 @@ def get_pools_layout():
                                     )
                                 ]
                             ],
+                            key="pools_3_tab",
                         )
                     ],
                 ],
@@ -613,6 +617,8 @@ def get_pools_layout():
                 pad=TAB_PAD,
                 expand_x=True,
                 expand_y=True,
+                key="pools_tabs",
+                enable_events=True,
             )
         ],
     ]
@@ -833,6 +839,7 @@ layout = [
                         "Scan",
                         get_scan_layout(),
                         pad=TAB_PAD,
+                        key="scan_tab",
                     )
                 ],
                 [
@@ -840,6 +847,7 @@ layout = [
                         "Boards",
                         get_boards_layout(),
                         pad=TAB_PAD,
+                        key="boards_tab",
                     )
                 ],
                 [
@@ -847,6 +855,7 @@ layout = [
                         "Errors",
                         get_errors_layout(),
                         pad=TAB_PAD,
+                        key="errors_tab",
                     )
                 ],
                 [
@@ -854,6 +863,7 @@ layout = [
                         "Pools",
                         get_pools_layout(),
                         pad=TAB_PAD,
+                        key="pools_tab",
                     )
                 ],
                 [
@@ -861,6 +871,7 @@ layout = [
                         "Configure",
                         get_config_layout(),
                         pad=TAB_PAD,
+                        key="cfg_tab",
                     )
                 ],
                 [
@@ -868,6 +879,7 @@ layout = [
                         "Command",
                         get_command_layout(),
                         pad=TAB_PAD,
+                        key="cmd_tab",
                     )
                 ],
             ],
@@ -877,6 +889,8 @@ layout = [
             tab_border_width=2,
             expand_y=True,
             expand_x=True,
+            key="tabs",
+            enable_events=True,
         ),
     ],
 ]
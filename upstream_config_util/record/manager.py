@@ -2,7 +2,8 @@ import asyncio
 
 from upstream_config_util.record.pdf import generate_pdf
 
-from pyasic.miners.factory import miner_factory
+from upstream_config_util.fleet.fetch import fetch_data
+from upstream_config_util.fleet.registry import MINER_REGISTRY
 
 from typing import List, Dict
 
@@ -47,7 +48,7 @@ class RecordingManager(metaclass=Singleton):
 
             tasks = []
             for miner in self.miners:
-                tasks.append(miner.get_data())
+                tasks.append(fetch_data(miner, max_age=self.interval))
 
             for complete in asyncio.as_completed(tasks):
                 data = await complete
@@ -79,8 +80,12 @@ class RecordingManager(metaclass=Singleton):
         self.interval = interval
         self.state = RECORDING
         self.record_window["record_status"].update("Recording...")
-        async for miner in miner_factory.get_miner_generator(ips):
-            self.miners.append(miner)
+        miners, unresolved = await MINER_REGISTRY.get_miners(ips)
+        self.miners.extend(miners)
+        if unresolved:
+            self.record_window["record_status"].update(
+                f"Recording... ({len(unresolved)} miners not found)"
+            )
 
         asyncio.create_task(self._record_loop())
 
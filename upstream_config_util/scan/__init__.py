@@ -1,13 +1,22 @@
 import asyncio
 import logging
+import os
+from functools import partial
 
+import FreeSimpleGUI as sg
 from pyasic import APIError
-from pyasic.network import MinerNetwork
 from upstream_config_util import tables
 from upstream_config_util.decorators import disable_buttons
+from upstream_config_util.fleet.fetch import fetch_data, got_data
+from upstream_config_util.fleet.identity import IDENTITY_CACHE
+from upstream_config_util.fleet.jobs import ScanJob, load_scan_jobs
+from upstream_config_util.fleet.pipeline import Pipeline, iterate
+from upstream_config_util.fleet.registry import MINER_REGISTRY
+from upstream_config_util.fleet.scanner import retry_pass, scan_jobs
+from upstream_config_util.fleet.shards import sharded_scan
 from upstream_config_util.general import btn_all, btn_web, btn_refresh
 from upstream_config_util.layout import update_prog_bar, TABLE_HEADERS
-from upstream_config_util.layout import window
+from upstream_config_util.layout import window, WINDOW_ICON
 from upstream_config_util.record import record_ui
 from upstream_config_util.tables import clear_tables
 import settings
@@ -17,18 +26,22 @@ TABLE = "scan_table"
 
 async def handle_event(event, value):
     if event == "scan_all":
-        btn_all(TABLE, value[TABLE])
+        btn_all(TABLE, tables.selected_rows(TABLE))
     if event == "scan_web":
-        btn_web(TABLE, value[TABLE])
+        btn_web(TABLE, tables.selected_rows(TABLE))
     if event == "scan_refresh":
-        asyncio.create_task(btn_refresh(TABLE, value[TABLE]))
+        asyncio.create_task(btn_refresh(TABLE, tables.selected_rows(TABLE)))
     if event == "btn_scan":
         asyncio.create_task(btn_scan(value["scan_ip"]))
     if event == "scan_cancel":
         asyncio.create_task(scan_cancel())
+    if event in ("tabs", "pools_tabs") and not value["tabs"] == "scan_tab":
+        # the other tabs show the fields the scan left out
+        BACKFILL_MANAGER.request()
     if event == "record":
-        if value[TABLE]:
-            ips = [window[TABLE].Values[row][0] for row in value[TABLE]]
+        selected = tables.selected_rows(TABLE)
+        if selected:
+            ips = [window[TABLE].Values[row][0] for row in selected]
         else:
             ips = [
                 window[TABLE].Values[row][0] for row in range(len(window[TABLE].Values))
@@ -40,11 +53,16 @@ class ScanTabManager:
     def __init__(self):
         self.scan_task = None
 
-    async def scan_miners(self, network: MinerNetwork):
-        self.scan_task = asyncio.create_task(_scan_miners(network))
+    async def scan_miners(self, jobs: list):
+        self.scan_task = asyncio.create_task(_scan_miners(jobs))
         window["scan_cancel"].update(visible=True)
         await self.scan_task
         window["scan_cancel"].update(visible=False)
+        BACKFILL_MANAGER.start()
+
+    @property
+    def scanning(self) -> bool:
+        return self.scan_task is not None and not self.scan_task.done()
 
     async def cancel(self):
         self.scan_task.cancel()
@@ -53,9 +71,80 @@ class ScanTabManager:
             await asyncio.sleep(0.1)
 
 
+class BackfillManager:
+    """Fetches the fields a scan left out, once the scan table is filled."""
+
+    def __init__(self):
+        self.pending = {}
+        self.include = []
+        self.requested = False
+        self.task = None
+
+    def add(self, miner, data):
+        if self.include:
+            self.pending[str(miner.ip)] = (miner, data)
+
+    async def reset(self, include: list):
+        self.cancel()
+        if self.task is not None:
+            await asyncio.gather(self.task, return_exceptions=True)
+        self.pending = {}
+        self.include = include
+        self.requested = settings.get("scan_backfill", "background") == "background"
+
+    def request(self):
+        self.requested = True
+        self.start()
+
+    def start(self):
+        if not self.requested or not self.pending or SCAN_TAB_MANAGER.scanning:
+            return
+        if self.task is not None and not self.task.done():
+            return
+        self.task = asyncio.create_task(self._run())
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    async def _run(self):
+        # miners scanned again while this runs are picked up on the next pass
+        while self.pending:
+            items = list(self.pending.values())
+            self.pending = {}
+            pipeline = Pipeline(
+                iterate(items),
+                self._backfill_miner,
+                workers=settings.get("backfill_threads", 50),
+                queue_size=settings.get("scan_queue_size", 1000),
+                cancel_timeout=0,
+            )
+            await pipeline.run()
+            IDENTITY_CACHE.save()
+            logging.info(f"Backfilled scan data. {pipeline.summary()}")
+            if pipeline.cancelled:
+                return
+
+    async def _backfill_miner(self, item):
+        miner, data = item
+        before = data.asdict()
+        extra = await fetch_data(miner, include=self.include)
+        for option in self.include:
+            value = getattr(extra, option, None)
+            if value is not None:
+                setattr(data, option, value)
+        # only send what changed, so newer data from a refresh is kept
+        after = data.asdict()
+        changed = {key: val for key, val in after.items() if before.get(key) != val}
+        tables.update_item({"ip": str(miner.ip), **changed})
+        IDENTITY_CACHE.add(miner, fw_ver=data.fw_ver)
+
+
 progress_bar_len = 0
+hosts_scanned = 0
 DEFAULT_DATA = set()
 SCAN_TAB_MANAGER = ScanTabManager()
+BACKFILL_MANAGER = BackfillManager()
 
 for table in TABLE_HEADERS:
     for header in TABLE_HEADERS[table]:
@@ -67,82 +156,209 @@ async def scan_cancel():
 
 
 async def btn_scan(scan_ip: str = None):
-    if scan_ip is not None and not scan_ip == "":
-        scan_ip = scan_ip.replace(" ", "")
-        if "/" in scan_ip:
-            network = MinerNetwork.from_subnet(scan_ip)
-        elif "," in scan_ip:
-            network = MinerNetwork.from_list(scan_ip.split(","))
-        elif "-" in scan_ip:
-            network = MinerNetwork.from_address(scan_ip)
-        else:
-            network = MinerNetwork.from_subnet(scan_ip + "/24")
+    if scan_ip is not None and scan_ip.strip().endswith(".toml"):
+        # a file with [[scan_jobs]] tables
+        try:
+            jobs = load_scan_jobs(os.path.expanduser(scan_ip.strip()))
+        except (OSError, ValueError) as e:
+            logging.error(f"Failed to load scan jobs: {e}")
+            return
+    elif scan_ip is not None and not scan_ip == "":
+        targets = scan_ip.replace(" ", "").split(",")
+        if len(targets) == 1 and not any(char in targets[0] for char in "/-!"):
+            targets = [targets[0] + "/24"]
+        jobs = [ScanJob(targets)]
+    elif settings.get("scan_jobs"):
+        jobs = [ScanJob.from_dict(job) for job in settings.get("scan_jobs")]
     else:
-        network = MinerNetwork.from_subnet("192.168.1.0/24")
-    asyncio.create_task(SCAN_TAB_MANAGER.scan_miners(network))
+        jobs = [ScanJob(["192.168.1.0/24"])]
+    asyncio.create_task(SCAN_TAB_MANAGER.scan_miners(jobs))
 
 
 @disable_buttons("Scanning")
-async def _scan_miners(network: MinerNetwork):
-    """Scan the given network for miners, get data, and fill in the table."""
+async def _scan_miners(jobs: list):
+    """Scan the networks of the scan jobs for miners, get data, and fill the table."""
+    shards = settings.get("scan_shards", 0)
+
+    # split the data into what the scan table shows and what is backfilled,
+    # sharded scans get everything in the worker processes instead
+    if shards > 1:
+        scan_include, backfill_include = settings.get("include"), []
+    else:
+        scan_include, backfill_include = _split_include()
+    await BACKFILL_MANAGER.reset(backfill_include)
+
     # clear the tables on the config tool to prepare for new miners
     clear_tables()
 
-    # create async generator to scan network for miners
-    scan_generator = network.scan_network_generator()
+    global progress_bar_len, hosts_scanned
+    progress_bar_len = 0
+    hosts_scanned = 0
+    network_size = sum(len(job) for job in jobs)
+
+    if shards > 1:
+        cancelled, summary = await _scan_sharded(jobs, shards, scan_include)
+    else:
+        cancelled, summary = await _scan_pipeline(jobs, scan_include)
+
+    tables.flush_tables()
+    IDENTITY_CACHE.save()
+
+    if cancelled:
+        BACKFILL_MANAGER.requested = False
+        logging.info(f"Cancelled scan. {summary}")
+        sg.popup_non_blocking(
+            f"Checked {hosts_scanned} of {network_size} addresses.\n{summary}",
+            title="Scan Cancelled",
+            keep_on_top=True,
+            icon=WINDOW_ICON,
+        )
+
+    # finish updating progress bar
+    await update_prog_bar(100, 100)
+
+
+async def _scan_pipeline(jobs: list, include: list) -> tuple:
+    # create async generator to scan the jobs for miners
+    scan_generator = scan_jobs(jobs)
 
     # set progress bar length to 2x network size and reset it to 0
-    global progress_bar_len
-    progress_bar_len = 0
-    network_size = len(network)
+    network_size = sum(len(job) for job in jobs)
     await update_prog_bar(progress_bar_len, _max=(2 * network_size))
 
-    #  asynchronously get each miner scanned by the generator
-    miners = []
-    data_tasks = []
+    # get data from each miner as it is found with a fixed number of workers
+    failed = []
+    pipeline = Pipeline(
+        _discover_miners(scan_generator),
+        partial(_get_miner_data, include=include, failed=failed),
+        workers=settings.get("data_threads", 300),
+        queue_size=settings.get("scan_queue_size", 1000),
+        cancel_timeout=settings.get("scan_cancel_timeout", 5),
+    )
+    await pipeline.run()
+
+    # give the miners that failed another chance, busy networks drop requests
+    cancelled = pipeline.cancelled
+    # failed fetches are processed too, they just didn't get any data
+    got_data = pipeline.processed.count - len(failed)
+    retried = ""
+    if failed and not cancelled and settings.get("scan_retry", True):
+        cancelled, recovered = await _retry_failed(failed, include)
+        got_data += recovered
+        retried = f"\nRecovered {recovered} of {len(failed)} failed miners on retry."
+
+    summary = (
+        f"Found {pipeline.discovered.count} miners, "
+        f"got data from {got_data}.\n"
+        f"Skipped {pipeline.dropped + pipeline.aborted} miners that were "
+        f"still waiting for data." + retried
+    )
+    return cancelled, summary
+
+
+async def _scan_sharded(jobs: list, shards: int, include: list) -> tuple:
+    """Scan the jobs in worker processes, filling in the table as batches come back."""
+    global progress_bar_len, hosts_scanned
+
+    network_size = sum(len(job) for job in jobs)
+    await update_prog_bar(progress_bar_len, _max=network_size)
+
+    found = 0
+    try:
+        async for scanned, batch in sharded_scan(jobs, shards, include):
+            for data, miner_class in batch:
+                tables.update_item(data)
+                if miner_class is not None:
+                    IDENTITY_CACHE.add_entry(
+                        data["ip"], miner_class, data.get("mac"), data.get("fw_ver")
+                    )
+                    MINER_REGISTRY.add(IDENTITY_CACHE.build(data["ip"]))
+            found += len(batch)
+            hosts_scanned += scanned
+            progress_bar_len += scanned
+            await update_prog_bar(progress_bar_len)
+    except asyncio.CancelledError:
+        return True, f"Found {found} miners."
+    return False, f"Found {found} miners."
+
+
+async def _retry_failed(miners: list, include: list) -> tuple:
+    """Get data again from miners that failed, returns (cancelled, recovered)."""
+    logging.info(f"Retrying {len(miners)} miners that failed during the scan")
+    window["status"].update("Retrying")
+    await update_prog_bar(progress_bar_len, _max=progress_bar_len + len(miners))
+
+    still_failed = []
+    pipeline = await retry_pass(
+        miners, partial(_get_miner_data, include=include, failed=still_failed)
+    )
+    recovered = pipeline.processed.count - len(still_failed)
+    logging.info(
+        f"Recovered {recovered} of {len(miners)} miners on retry. {pipeline.summary()}"
+    )
+    # a cancelled retry is shown in the cancel summary instead
+    if not pipeline.cancelled:
+        sg.popup_non_blocking(
+            f"Recovered {recovered} of {len(miners)} miners that failed the scan.",
+            title="Scan Retried",
+            keep_on_top=True,
+            icon=WINDOW_ICON,
+        )
+    return pipeline.cancelled, recovered
+
+
+def _split_include() -> tuple:
+    include = settings.get("include")
+    if not include or settings.get("scan_backfill", "background") == "off":
+        return include, []
+    scan_fields = settings.get("scan_include", [])
+    scan_include = [option for option in include if option in scan_fields]
+    backfill_include = [option for option in include if option not in scan_fields]
+    return scan_include, backfill_include
+
+
+async def _discover_miners(scan_generator):
+    global progress_bar_len, hosts_scanned
+
     try:
         async for miner in scan_generator:
-            # if the generator yields a miner, add it to our list
+            hosts_scanned += 1
+            # if the generator yields a miner, add it to the table and queue it
             if miner is not None:
-                miners.append(miner)
-
-                # sort the list of miners by IP
-                miners.sort()
-
-                # generate default data for the table manager
-                _data = {"ip": str(miner.ip)}
-                tables.update_item(_data)
-
-                # create a task to get data, and save it to ensure it finishes
-                data_tasks.append(asyncio.create_task(_get_miner_data(miner)))
+                MINER_REGISTRY.add(miner)
+                tables.update_item({"ip": str(miner.ip)})
+                yield miner
             else:
                 progress_bar_len += 1
 
             # update progress bar to indicate scanned miners
             progress_bar_len += 1
             await update_prog_bar(progress_bar_len)
-    except asyncio.CancelledError:
-        logging.info("Cancelled scan.")
-        await update_prog_bar(progress_bar_len)
-
-    # make sure all getting data has finished
-    await asyncio.gather(*data_tasks)
-
-    # finish updating progress bar
-    await update_prog_bar(100, 100)
+    finally:
+        # stops the scan workers when discovery is cancelled
+        await scan_generator.aclose()
 
 
-async def _get_miner_data(miner):
+async def _get_miner_data(miner, include: list = None, failed: list = None):
     global progress_bar_len
 
     try:
-        tables.update_item(await _get_data(miner))
-    except APIError as e:
+        data = await fetch_data(miner, include=include)
+        tables.update_item(data.asdict())
+        IDENTITY_CACHE.add(miner, mac=data.mac, fw_ver=data.fw_ver)
+        BACKFILL_MANAGER.add(miner, data)
+        # pyasic hides most failed requests, leaving the data empty
+        if not got_data(data, include):
+            raise APIError("No data returned from the miner.")
+    except (APIError, asyncio.TimeoutError, OSError) as e:
         print(e)
+        MINER_REGISTRY.invalidate(miner.ip)
+        if failed is not None:
+            failed.append(miner)
+    except Exception as e:
+        logging.error(f"{miner.ip}: Failed to get data: {e}")
+        if failed is not None:
+            failed.append(miner)
 
     progress_bar_len += 1
     await update_prog_bar(progress_bar_len)
-
-
-async def _get_data(miner):
-    return (await miner.get_data(include=settings.get("include"))).asdict()
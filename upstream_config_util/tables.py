@@ -11,9 +11,42 @@ from upstream_config_util.layout import (
     HASHRATE_SELECTED_BUTTONS,
     WATTAGE_SELECTED_BUTTONS,
 )
+from upstream_config_util.fleet.fetch import DATA_FETCHER
+from upstream_config_util.fleet.store import FleetStore
 from upstream_config_util.imgs import LIGHT, FAULT_LIGHT
-import FreeSimpleGUI as sg
+from upstream_config_util.keyed_tree import KeyedTree
+from upstream_config_util.virtual import VirtualTable
 import ipaddress
+import time
+from array import array
+from bisect import bisect_left, insort
+
+import settings
+
+TABLE_NAMES = {
+    "SCAN": "scan_table",
+    "BOARDS": "boards_table",
+    "POOLS_ALL": "pools_table",
+    "POOLS_1": "pools_1_table",
+    "POOLS_2": "pools_2_table",
+    "POOLS_3": "pools_3_table",
+    "CONFIG": "cfg_table",
+    "CMD": "cmd_table",
+    "ERRORS": "errors_table",
+}
+
+# tables shown on each tab, the pools tab is split into its own sub tabs
+TAB_TABLES = {
+    "scan_tab": "SCAN",
+    "boards_tab": "BOARDS",
+    "errors_tab": "ERRORS",
+    "cfg_tab": "CONFIG",
+    "cmd_tab": "CMD",
+    "pools_all_tab": "POOLS_ALL",
+    "pools_1_tab": "POOLS_1",
+    "pools_2_tab": "POOLS_2",
+    "pools_3_tab": "POOLS_3",
+}
 
 DATA_PARSE_MAP = {
     "IP": {
@@ -53,19 +86,19 @@ DATA_PARSE_MAP = {
         "default": int,
     },
     "Board 1": {
-        "parser": lambda x: x["hashboards"][0]["chips"],
+        "parser": lambda x: x["board_1_chips"],
         "default": int,
     },
     "Board 2": {
-        "parser": lambda x: x["hashboards"][1]["chips"],
+        "parser": lambda x: x["board_2_chips"],
         "default": int,
     },
     "Board 3": {
-        "parser": lambda x: x["hashboards"][2]["chips"],
+        "parser": lambda x: x["board_3_chips"],
         "default": int,
     },
     "Board 4": {
-        "parser": lambda x: x["hashboards"][3]["chips"],
+        "parser": lambda x: x["board_4_chips"],
         "default": int,
     },
     "Total": {
@@ -77,31 +110,31 @@ DATA_PARSE_MAP = {
         "default": int,
     },
     "Quota": {
-        "parser": lambda x: x["config"]["pools"]["groups"][0]["quota"],
+        "parser": lambda x: x["pool_split"],
         "default": str,
     },
     "Pool 1": {
-        "parser": lambda x: x["config"]["pools"]["groups"][0]["pools"][0]["url"],
+        "parser": lambda x: x["pool_1_url"],
         "default": str,
     },
     "Pool 1 User": {
-        "parser": lambda x: x["config"]["pools"]["groups"][0]["pools"][0]["user"],
+        "parser": lambda x: x["pool_1_user"],
         "default": str,
     },
     "Pool 2": {
-        "parser": lambda x: x["config"]["pools"]["groups"][0]["pools"][1]["url"],
+        "parser": lambda x: x["pool_2_url"],
         "default": str,
     },
     "Pool 2 User": {
-        "parser": lambda x: x["config"]["pools"]["groups"][0]["pools"][1]["user"],
+        "parser": lambda x: x["pool_2_user"],
         "default": str,
     },
     "Pool 3": {
-        "parser": lambda x: x["config"]["pools"]["groups"][0]["pools"][2]["url"],
+        "parser": lambda x: x["pool_3_url"],
         "default": str,
     },
     "Pool 3 User": {
-        "parser": lambda x: x["config"]["pools"]["groups"][0]["pools"][2]["user"],
+        "parser": lambda x: x["pool_3_user"],
         "default": str,
     },
     "Chip %": {
@@ -132,6 +165,72 @@ DATA_PARSE_MAP = {
 }
 
 
+def _compile_cell(parse_map: dict):
+    parser = parse_map["parser"]
+    default = parse_map["default"]
+    formatter = parse_map.get("formatter")
+    suffix = parse_map.get("suffix")
+
+    # fold the suffix into the formatter so each cell does at most one call
+    if suffix is not None:
+        if formatter is None:
+            formatter = lambda x: f"{x}{suffix}"
+        else:
+            formatter = (lambda fmt: lambda x: f"{fmt(x)}{suffix}")(formatter)
+
+    if formatter is None:
+
+        def cell(item):
+            val = parser(item)
+            return default() if val is None else val
+
+    else:
+
+        def cell(item):
+            val = parser(item)
+            return formatter(default() if val is None else val)
+
+    return cell
+
+
+def _empty_cell(item):
+    return ""
+
+
+def _safe_cell(cell, item):
+    try:
+        return cell(item)
+    except (LookupError, TypeError):
+        return ""
+
+
+def _compile_row_builder(headers: dict):
+    cells = tuple(
+        (
+            _compile_cell(DATA_PARSE_MAP[header])
+            if DATA_PARSE_MAP.get(header, {}).get("parser") is not None
+            else _empty_cell
+        )
+        for header in headers
+    )
+
+    def build_row(item: dict) -> tuple:
+        try:
+            return tuple([cell(item) for cell in cells])
+        except (LookupError, TypeError):
+            # partially filled miners (i.e. IP only) fall back to per cell checks
+            return tuple([_safe_cell(cell, item) for cell in cells])
+
+    return build_row
+
+
+ROW_BUILDERS = {
+    table: _compile_row_builder(TABLE_HEADERS[table])
+    for table in TABLE_HEADERS
+    if not table == "ERRORS"
+}
+
+
 def update_miner_count(count):
     for button in MINER_COUNT_BUTTONS:
         window[button].update(f"Total Miners: {count}")
@@ -172,13 +271,96 @@ def update_selected_total_wattage(wattage: float, expected_wattage: float):
         window[button].update(f"Selected W: {wattage}")
 
 
+class _Descending:
+    """Inverts the ordering of a sort value, used for reversed sorts."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
 class TableManager:
     def __init__(self):
-        self.data = {}
+        self.data = FleetStore()
         self.sort_key = "IP"
         self.sort_reverse = False
-        self.selected_rows = []
+        # store rows of the miners selected across all tables
+        self.selected_rows = set()
         self.tree_updated = False
+        # rows that need to be re-parsed from self.data before the next render
+        self.dirty = set()
+        # parsed rows for each miner, keyed by ip, then by table
+        self.rows = {}
+        self.headings_dirty = True
+        # virtualized views over the table elements, created on first render
+        self.views = {}
+        self.trees = {}
+        # store rows in display order for each table, used to map selections
+        self.row_index = {}
+        # ips ordered by the active sort key, with each miner's cached sort entry
+        self.sort_order = []
+        self.sort_entries = {}
+        self.sort_dirty = False
+        # changes are coalesced and painted at most this many times per second,
+        # 0 or less paints them on every pass of the event loop
+        self.refresh_rate = max(0, settings.get("table_refresh_rate", 10))
+        self.pending = False
+        self.last_render = 0.0
+        # only tables on visible tabs are painted, the rest are marked stale
+        # and painted once when their tab is opened
+        self.active_tables = {"SCAN"}
+        self.stale = set()
+
+    def schedule(self):
+        self.pending = True
+
+    def render(self):
+        if not self.pending:
+            return
+        if self.refresh_rate:
+            if time.monotonic() - self.last_render < 1 / self.refresh_rate:
+                return
+        self.flush()
+
+    def flush(self):
+        self.pending = False
+        self.last_render = time.monotonic()
+        self.update_tables()
+
+    def _view(self, key: str) -> VirtualTable:
+        if key not in self.views:
+            self.views[key] = VirtualTable(
+                window[key],
+                max_rows=settings.get("virtual_table_rows", 5000),
+                margin=settings.get("virtual_table_margin", 100),
+            )
+        return self.views[key]
+
+    def _tree(self, key: str) -> KeyedTree:
+        if key not in self.trees:
+            self.trees[key] = KeyedTree(window[key])
+        return self.trees[key]
+
+    def set_active_tabs(self, tabs: list):
+        self.active_tables = {TAB_TABLES[tab] for tab in tabs if tab in TAB_TABLES}
+        if self.stale & self.active_tables:
+            self.flush()
+
+    def select_rows(self, key: str, rows: list):
+        self._view(key).select(rows)
+
+    def get_selected(self, key: str) -> list:
+        # Tk only knows about the materialized rows, the view tracks all of them
+        if key in TABLE_KEYS["table"]:
+            return sorted(self._view(key).selected)
+        return window[key].SelectedRows
 
     def update_data(self, data: list):
         if not data:
@@ -193,59 +375,46 @@ class TableManager:
         if self.sort_key == sort_key:
             self.sort_reverse = not self.sort_reverse
         self.sort_key = sort_key
-        self.update_tables()
+        self.headings_dirty = True
+        self.sort_dirty = True
+        self.flush()
 
     def update_item(self, data: dict):
         if not data or data == {} or not data.get("ip"):
             return
 
-        if not data["ip"] in self.data.keys():
-            self.data[data["ip"]] = {}
+        if not data["ip"] in self.data:
+            self.data.add(data["ip"])
+            self.dirty.add(data["ip"])
 
         if not data.get("fault_light") and not self.data[data["ip"]].get("fault_light"):
             data["fault_light"] = False
 
-        for key in data.keys():
-            self.data[data["ip"]][key] = data[key]
+        if self.data.update(data["ip"], data):
+            self.dirty.add(data["ip"])
 
-        self.update_tables()
+        if self.dirty:
+            self.schedule()
 
     def clear_item(self, ip: str):
-        if ip in self.data.keys():
-            self.data[ip] = {"ip": ip, "fault_light": False}
-
-    def update_tables(self):
-        tables = {
-            "SCAN": [["" for _ in TABLE_HEADERS["SCAN"]] for _ in self.data],
-            "CMD": [["" for _ in TABLE_HEADERS["CMD"]] for _ in self.data],
-            "BOARDS": [["" for _ in TABLE_HEADERS["BOARDS"]] for _ in self.data],
-            "POOLS_ALL": [["" for _ in TABLE_HEADERS["POOLS_ALL"]] for _ in self.data],
-            "POOLS_1": [["" for _ in TABLE_HEADERS["POOLS_1"]] for _ in self.data],
-            "POOLS_2": [["" for _ in TABLE_HEADERS["POOLS_2"]] for _ in self.data],
-            "POOLS_3": [["" for _ in TABLE_HEADERS["POOLS_3"]] for _ in self.data],
-            "CONFIG": [["" for _ in TABLE_HEADERS["CONFIG"]] for _ in self.data],
-            "ERRORS": [],
-        }
-
-        ip_sorted_keys = sorted(self.data.keys(), key=lambda x: ipaddress.ip_address(x))
-        sorted_keys = sorted(
-            ip_sorted_keys, reverse=self.sort_reverse, key=lambda x: self._get_sort(x)
-        )
-
-        table_names = {
-            "SCAN": "scan_table",
-            "BOARDS": "boards_table",
-            "POOLS_ALL": "pools_table",
-            "POOLS_1": "pools_1_table",
-            "POOLS_2": "pools_2_table",
-            "POOLS_3": "pools_3_table",
-            "CONFIG": "cfg_table",
-            "CMD": "cmd_table",
-            "ERRORS": "errors_table",
-        }
-
+        if ip in self.data:
+            self.data.clear(ip)
+            self.data.update(ip, {"ip": ip, "fault_light": False})
+            self.dirty.add(ip)
+            self.schedule()
+
+    def _parse_rows(self, ip: str) -> dict:
+        item = self.data[ip]
+        rows = {table: build_row(item) for table, build_row in ROW_BUILDERS.items()}
+
+        rows["ERRORS"] = []
+        for code, msg_val in item.get("errors", ()):
+            rows["ERRORS"].append((item["ip"], str(code), msg_val))
+        return rows
+
+    def _update_headings(self):
         for table in TABLE_HEADERS:
-            widget = window[table_names[table]].Widget
+            widget = window[TABLE_NAMES[table]].Widget
             for idx, header in enumerate(TABLE_HEADERS[table]):
                 _header = header
                 if header == self.sort_key:
@@ -268,83 +437,101 @@ class TableManager:
                 _header = f"Light▲"
             widget.heading(idx, text=_header)
 
-        for data_idx, ip in enumerate(sorted_keys):
-            item = self.data[ip]
-            headers = {**TABLE_HEADERS}
-            del headers["ERRORS"]
-            for table in headers:
-                for idx, header in enumerate(TABLE_HEADERS[table]):
-                    parse_map = DATA_PARSE_MAP.get(header)
-                    if parse_map is None:
-                        continue
-                    try:
-                        val = parse_map["parser"](item)
-                    except (LookupError, TypeError):
-                        continue
-                    if val is None:
-                        val = parse_map["default"]()
-
-                    if parse_map.get("formatter") is not None:
-                        val = parse_map["formatter"](val)
-                    if parse_map.get("suffix") is not None:
-                        val = f"{val}{parse_map['suffix']}"
-                    tables[table][data_idx][idx] = val
-
-        for data_idx, ip in enumerate(sorted_keys):
-            item = self.data[ip]
-            for err in item.get("errors", []):
-                msg_val = err.get("error_message")
-                code_val = str(err.get("error_code"))
-
-                val = [item["ip"], code_val, msg_val]
-                tables["ERRORS"].append(val)
-
-        window["scan_table"].update(tables["SCAN"])
-        window["boards_table"].update(tables["BOARDS"])
-        window["pools_table"].update(tables["POOLS_ALL"])
-        window["pools_1_table"].update(tables["POOLS_1"])
-        window["pools_2_table"].update(tables["POOLS_2"])
-        window["pools_3_table"].update(tables["POOLS_3"])
-        window["cfg_table"].update(tables["CONFIG"])
-
-        window["errors_table"].update(tables["ERRORS"])
-
-        treedata = sg.TreeData()
-        for idx, item in enumerate(tables["CMD"]):
-            ico = LIGHT
-            status = " Off"
-            if self.data[item[0]]["fault_light"]:
-                ico = FAULT_LIGHT
-                status = " On"
-            treedata.insert("", idx, status, item, icon=ico)
-
-        window["cmd_table"].update(treedata)
+    def update_tables(self):
+        if self.headings_dirty:
+            self._update_headings()
+            self.headings_dirty = False
+
+        if self.dirty or self.sort_dirty:
+            self.stale = set(TABLE_HEADERS)
+        render = self.stale & self.active_tables
+        self.stale -= render
+
+        # only re-parse the miners that changed since the last render
+        for ip in self.dirty:
+            if ip in self.data:
+                self.rows[ip] = self._parse_rows(ip)
+                if not self.sort_dirty:
+                    self._index_item(ip)
+        self.dirty = set()
+
+        if self.sort_dirty:
+            self._resort()
+            self.sort_dirty = False
+        sorted_keys = [entry[2] for entry in self.sort_order]
+
+        tables = {table: [] for table in render}
+        error_rows = array("q")
+        for ip in sorted_keys:
+            rows = self.rows[ip]
+            for table in render:
+                if table == "ERRORS":
+                    tables[table].extend(rows[table])
+                else:
+                    tables[table].append(rows[table])
+            if "ERRORS" in render:
+                error_rows.extend([self.data.index[ip]] * len(rows["ERRORS"]))
+
+        # keep the same miners selected when the rows move around
+        keep = {}
+        for table in render:
+            key = TABLE_NAMES[table]
+            if key in TABLE_KEYS["table"] and key != "errors_table":
+                if self._view(key).selected:
+                    keep[key] = self._store_rows(key, self._view(key).selected)
+
+        # selections map through the rows as they were last painted
+        store_rows = array("q", [self.data.index[ip] for ip in sorted_keys])
+        for table in render:
+            self.row_index[TABLE_NAMES[table]] = store_rows
+        if "ERRORS" in render:
+            self.row_index["errors_table"] = error_rows
+
+        for table in render:
+            if table == "CMD":
+                continue
+            self._view(TABLE_NAMES[table]).set_rows(tables[table])
+        for key, selected in keep.items():
+            self._view(key).select(self._table_rows(key, selected))
+
+        if "CMD" in render:
+            tree_rows = []
+            for item in tables["CMD"]:
+                if self.data[item[0]]["fault_light"]:
+                    tree_rows.append((" On", item, FAULT_LIGHT))
+                else:
+                    tree_rows.append((" Off", item, LIGHT))
+            self._tree("cmd_table").set_rows(tree_rows)
 
         update_miner_count(len(self.data))
-        total_hr = 0
-        total_expected_hr = 0
-        total_wattage = 0
-        total_expected_wattage = 0
-        for key in self.data.keys():
-            hashrate = 0
-            expected_hashrate = 0
-            wattage = 0
-            expected_wattage = 0
-            if self.data[key].get("hashrate") is not None:
-                hashrate = self.data[key]["hashrate"]
-            if self.data[key].get("expected_hashrate") is not None:
-                expected_hashrate = self.data[key]["expected_hashrate"]
-            if self.data[key].get("wattage") is not None:
-                wattage = self.data[key]["wattage"]
-            if self.data[key].get("wattage_limit") is not None:
-                expected_wattage = self.data[key]["wattage_limit"]
-            total_hr += float(hashrate)
-            total_expected_hr += float(expected_hashrate)
-            total_wattage += float(wattage)
-            total_expected_wattage += float(expected_wattage)
+        total_hr = self.data.total("hashrate")
+        total_expected_hr = self.data.total("expected_hashrate")
+        total_wattage = self.data.total("wattage")
+        total_expected_wattage = self.data.total("wattage_limit")
         update_total_hr(round(total_hr), round(total_expected_hr))
         update_total_wattage(round(total_wattage), round(total_expected_wattage))
 
+    def _sort_entry(self, ip: str) -> tuple:
+        value = self._get_sort(ip)
+        if self.sort_reverse:
+            value = _Descending(value)
+        # ties are broken by ip, and the ip string is kept to map back to the row
+        return value, ipaddress.ip_address(ip), ip
+
+    def _index_item(self, ip: str):
+        new_entry = self._sort_entry(ip)
+        old_entry = self.sort_entries.get(ip)
+        if old_entry is not None:
+            if old_entry == new_entry:
+                return
+            del self.sort_order[bisect_left(self.sort_order, old_entry)]
+        insort(self.sort_order, new_entry)
+        self.sort_entries[ip] = new_entry
+
+    def _resort(self):
+        self.sort_entries = {ip: self._sort_entry(ip) for ip in self.data}
+        self.sort_order = sorted(self.sort_entries.values())
+
     def _get_sort(self, data_key: str):
         try:
             value = DATA_PARSE_MAP[self.sort_key]["parser"](self.data[data_key])
@@ -368,89 +555,70 @@ class TableManager:
         return DATA_PARSE_MAP[self.sort_key]["default"]()
 
     def clear_tables(self):
-        self.data = {}
+        self.data = FleetStore()
+        self.rows = {}
+        self.dirty = set()
+        self.row_index = {}
+        self.selected_rows = set()
+        self.sort_order = []
+        self.sort_entries = {}
+        self.pending = False
+        self.stale = set()
         window["total_hashrate"].update("Total HR: 0/0 TH/s")
         window["total_wattage"].update("Total W: 0/0 W")
         window["miner_count"].update("Total Miners: 0")
         for table in TABLE_KEYS["table"]:
-            window[table].update([])
+            self._view(table).set_rows([])
         for tree in TABLE_KEYS["tree"]:
-            window[tree].update(sg.TreeData())
+            self._tree(tree).clear()
         update_miner_count(0)
 
+    def _store_rows(self, table: str, values: list) -> set:
+        """Map a selection in a table to rows in the store."""
+        if table in TABLE_KEYS["tree"]:
+            # trees are keyed by ip, so the selection maps straight to the store
+            return {self.data.index[ip] for ip in values if ip in self.data}
+        rows = self.row_index.get(table, array("q"))
+        return {
+            rows[value]
+            for value in values
+            if isinstance(value, int) and 0 <= value < len(rows)
+        }
+
+    def _table_rows(self, table: str, selected: set) -> list:
+        """Map rows in the store to positions in a table, as it was last painted."""
+        rows = self.row_index.get(table, array("q"))
+        return [idx for idx, row in enumerate(rows) if row in selected]
+
     def update_sums(self, table: str, values: list):
-        ips = set()
-        for value in values:
-            try:
-                if table == "cmd_table":
-                    ips.add(window[table].TreeData.tree_dict[value].values[0])
-                else:
-                    ips.add(window[table].Values[value][0])
-            except LookupError:
-                pass
-        total_wattage = sum(
-            [
-                (
-                    self.data[ip].get("wattage")
-                    if self.data[ip].get("wattage") is not None
-                    else 0
-                )
-                for ip in ips
-            ]
-        )
-        total_wattage_limit = sum(
-            [
-                (
-                    self.data[ip].get("wattage_limit")
-                    if self.data[ip].get("wattage_limit") is not None
-                    else 0
-                )
-                for ip in ips
-            ]
-        )
-        update_selected_total_wattage(total_wattage, total_wattage_limit)
-
-        total_hashrate = sum(
-            [
-                (
-                    self.data[ip].get("hashrate")
-                    if self.data[ip].get("hashrate") is not None
-                    else 0
-                )
-                for ip in ips
-            ]
-        )
-        total_expected_hashrate = sum(
-            [
-                (
-                    self.data[ip].get("expected_hashrate")
-                    if self.data[ip].get("expected_hashrate") is not None
-                    else 0
-                )
-                for ip in ips
-            ]
-        )
-        update_selected_total_hr(total_hashrate, total_expected_hashrate)
+        selected = self._store_rows(table, values)
+        totals = self.data.selected_totals(selected)
+        update_selected_total_wattage(totals["wattage"], totals["wattage_limit"])
+        update_selected_total_hr(totals["hashrate"], totals["expected_hashrate"])
 
-        selected_miners = len(ips)
+        selected_miners = len(selected)
         update_selected_miner_count(selected_miners)
 
-    def update_selected(self, values: list):
+    def update_selected(self, table: str, values: list):
         if self.tree_updated:
             self.tree_updated = False
             return
-        if self.selected_rows == values:
-            values = []
+        # tables may be stale and sorted differently, so go through the store
+        selected = self._store_rows(table, values)
+        if self.selected_rows == selected:
+            selected = set()
         for table_key in TABLE_KEYS["table"]:
             if table_key == "errors_table":
                 continue
-            table = window[table_key]
-            table.Update(select_rows=values)
+            self._view(table_key).select(self._table_rows(table_key, selected))
+        ips = [self.data.ips[row] for row in selected]
         for table_key in TABLE_KEYS["tree"]:
-            table = window[table_key]
-            table.TKTreeview.selection_set([table.KeyToID[x] for x in values])
+            tree = window[table_key]
+            tree.TKTreeview.selection_set(
+                [tree.KeyToID[ip] for ip in ips if ip in tree.KeyToID]
+            )
             self.tree_updated = True
-        self.selected_rows = values
+        self.selected_rows = selected
 
 
 TABLE_MANAGER = TableManager()
@@ -460,6 +628,14 @@ def update_tables(data: list or None = None):
     TABLE_MANAGER.update_data(data)
 
 
+def render_tables():
+    TABLE_MANAGER.render()
+
+
+def flush_tables():
+    TABLE_MANAGER.flush()
+
+
 def update_item(data: dict):
     TABLE_MANAGER.update_item(data)
 
@@ -470,15 +646,28 @@ def clear_item(ip: str):
 
 def clear_tables():
     TABLE_MANAGER.clear_tables()
+    DATA_FETCHER.clear()
 
 
 def update_sort_key(sort_key: str):
     TABLE_MANAGER.update_sort_key(sort_key)
 
 
+def update_active_tabs(tabs: list):
+    TABLE_MANAGER.set_active_tabs(tabs)
+
+
+def select_rows(table: str, rows: list):
+    TABLE_MANAGER.select_rows(table, rows)
+
+
+def selected_rows(table: str) -> list:
+    return TABLE_MANAGER.get_selected(table)
+
+
 def update_selected_miners_total(table: str, values: list):
     TABLE_MANAGER.update_sums(table, values)
 
 
-def update_all_tables_selected(values: list):
-    TABLE_MANAGER.update_selected(values)
+def update_all_tables_selected(table: str, values: list):
+    TABLE_MANAGER.update_selected(table, values)
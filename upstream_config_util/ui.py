@@ -31,17 +31,24 @@ def _tree_header_click_handler(event, table):
 
 
 def _table_copy(table):
-    selection = window[table].Widget.selection()
     _copy_values = []
-    for each in selection:
-        try:
-            value = window[table].Widget.item(each)["values"]
-            values = []
-            for item in value:
-                values.append(str(item).strip())
-            _copy_values.append(values)
-        except Exception:
-            pass
+    if table in TABLE_KEYS["table"]:
+        # tables may be virtualized, so copy from the rows rather than the widget
+        for row in tables.selected_rows(table):
+            _copy_values.append(
+                [str(item).strip() for item in window[table].Values[row]]
+            )
+    else:
+        selection = window[table].Widget.selection()
+        for each in selection:
+            try:
+                value = window[table].Widget.item(each)["values"]
+                values = []
+                for item in value:
+                    values.append(str(item).strip())
+                _copy_values.append(values)
+            except Exception:
+                pass
 
     copy_values = []
     for item in _copy_values:
@@ -51,7 +58,7 @@ def _table_copy(table):
 
 
 def _table_select_all(table):
-    btn_all(table, window[table].SelectedRows)
+    btn_all(table, tables.selected_rows(table))
 
 
 def bind_copy(key):
@@ -66,7 +73,7 @@ def bind_ctrl_a(key):
 
 async def ui():
     window.read(1)
-    tables.update_tables()
+    tables.flush_tables()
 
     for key in [*TABLE_KEYS["table"], *TABLE_KEYS["tree"]]:
         bind_copy(key)
@@ -95,6 +102,12 @@ async def ui():
                     table = window[event[0]].Widget
                     tables.update_sort_key(table.heading(event[2][1])["text"])
 
+        if event in ("tabs", "pools_tabs"):
+            active_tabs = [value["tabs"]]
+            if value["tabs"] == "pools_tab":
+                active_tabs.append(value["pools_tabs"])
+            tables.update_active_tabs(active_tabs)
+
         await scan.handle_event(event, value)
 
         await boards.handle_event(event, value)
@@ -106,32 +119,36 @@ async def ui():
         # pools tab
         if event == "pools_all":
             _table = "pools_table"
-            btn_all(_table, value[_table])
+            btn_all(_table, tables.selected_rows(_table))
         if event == "pools_web":
             _table = "pools_table"
-            btn_web(_table, value[_table])
+            btn_web(_table, tables.selected_rows(_table))
         if event == "pools_refresh":
             _table = "pools_table"
-            asyncio.create_task(btn_refresh(_table, value[_table]))
+            asyncio.create_task(btn_refresh(_table, tables.selected_rows(_table)))
 
         # errors tab
         if event == "errors_all":
             _table = "pools_table"
-            btn_all(_table, value[_table])
+            btn_all(_table, tables.selected_rows(_table))
         if event == "errors_web":
             _table = "pools_table"
-            btn_web(_table, value[_table])
+            btn_web(_table, tables.selected_rows(_table))
         if event == "errors_refresh":
             _table = "pools_table"
-            asyncio.create_task(btn_refresh(_table, value[_table]))
+            asyncio.create_task(btn_refresh(_table, tables.selected_rows(_table)))
 
         if "+CLICKED+" in event:
             if "_table" in event[0]:
-                update_selected_miners_total(event[0], value[event[0]])
-                update_all_tables_selected(value[event[0]])
+                selected = tables.selected_rows(event[0])
+                update_selected_miners_total(event[0], selected)
+                update_all_tables_selected(event[0], selected)
         elif event == "cmd_table":
-            update_selected_miners_total(event, value[event])
-            update_all_tables_selected(value[event])
+            selected = tables.selected_rows(event)
+            update_selected_miners_total(event, selected)
+            update_all_tables_selected(event, selected)
+
+        tables.render_tables()
 
         if event == "__TIMEOUT__":
             await asyncio.sleep(0.001)
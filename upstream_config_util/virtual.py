@@ -0,0 +1,149 @@
+class VirtualTable:
+    """Keeps a window of rows from a table element materialized in Tk."""
+
+    def __init__(self, element, max_rows: int = 5000, margin: int = 100):
+        self.element = element
+        self.widget = element.Widget
+        self.max_rows = max_rows
+        self.margin = margin
+        self.start = 0
+        self.end = 0
+        self.selected = set()
+        self.extending = False
+        self.recenter_pending = False
+
+        if getattr(element, "vsb", None) is not None:
+            element.vsb.configure(command=self.yview)
+        self.widget.configure(yscrollcommand=self._on_scroll)
+        self.widget.bind("<ButtonPress-1>", self._on_press, add="+")
+        self.widget.bind("<<TreeviewSelect>>", self._on_select, add="+")
+
+    @property
+    def rows(self) -> list:
+        return self.element.Values or []
+
+    @property
+    def window_size(self) -> int:
+        if len(self.rows) <= self.max_rows:
+            return len(self.rows)
+        return int(self.widget.cget("height")) + 2 * self.margin
+
+    def set_rows(self, rows: list):
+        """Replace the rows of the table, only touching the Tk items that changed."""
+        old_rows = self.rows
+
+        # if rows moved around, the selection no longer points at the same miners
+        reordered = len(old_rows) != len(rows) or any(
+            old[0] != new[0] for old, new in zip(old_rows, rows)
+        )
+
+        self.element.Values = rows
+        for idx in range(self.start, min(self.end, len(rows))):
+            if old_rows[idx] != rows[idx]:
+                self.widget.item(idx + 1, values=rows[idx])
+        if self.end > len(rows):
+            self.widget.delete(
+                *[idx + 1 for idx in range(max(len(rows), self.start), self.end)]
+            )
+            self.end = len(rows)
+            self.start = min(self.start, self.end)
+
+        if reordered:
+            self.selected = set()
+        self._materialize(self.start)
+
+    def select(self, rows: list):
+        self.selected = {row for row in rows if 0 <= row < len(self.rows)}
+        self._apply_selection()
+
+    def yview(self, *args):
+        if args and args[0] == "moveto":
+            self._recenter(int(float(args[1]) * len(self.rows)))
+        else:
+            # scrolling by units or pages moves within the materialized rows,
+            # _on_scroll shifts the window once the view gets close to an edge
+            self.widget.yview(*args)
+
+    def _on_scroll(self, first: str, last: str):
+        first, last = float(first), float(last)
+        total = len(self.rows)
+        count = self.end - self.start
+        if not total or not count:
+            self._set_scrollbar(first, last)
+            return
+
+        top = self.start + first * count
+        bottom = self.start + last * count
+        self._set_scrollbar(top / total, bottom / total)
+
+        near_start = self.start > 0 and top - self.start < self.margin / 2
+        near_end = self.end < total and self.end - bottom < self.margin / 2
+        if (near_start or near_end) and not self.recenter_pending:
+            self.recenter_pending = True
+            self.widget.after_idle(self._recenter, int(top))
+
+    def _set_scrollbar(self, first: float, last: float):
+        if getattr(self.element, "vsb", None) is not None:
+            self.element.vsb.set(first, last)
+
+    def _on_press(self, event):
+        # shift and control clicks add to the selection rather than replace it
+        self.extending = bool(event.state & 0x0005)
+
+    def _on_select(self, event=None):
+        visible = {int(iid) - 1 for iid in self.widget.selection()}
+        expected = {idx for idx in self.selected if self.start <= idx < self.end}
+        # materializing rows re-applies the selection, anything else is the user
+        if visible != expected:
+            if self.extending:
+                hidden = {
+                    idx for idx in self.selected if not self.start <= idx < self.end
+                }
+                self.selected = hidden | visible
+            else:
+                self.selected = visible
+        self.extending = False
+        self.element.SelectedRows = sorted(self.selected)
+
+    def _recenter(self, top: int):
+        self.recenter_pending = False
+        self._materialize(top - self.margin)
+        count = self.end - self.start
+        if count:
+            self.widget.yview_moveto((top - self.start) / count)
+
+    def _materialize(self, start: int):
+        rows = self.rows
+        size = self.window_size
+        start = max(0, min(start, len(rows) - size))
+        end = min(len(rows), start + size)
+
+        keep_start, keep_end = max(start, self.start), min(end, self.end)
+        if keep_start >= keep_end:
+            keep_start = keep_end = start
+        remove = [
+            idx + 1
+            for idx in range(self.start, self.end)
+            if not keep_start <= idx < keep_end
+        ]
+        if remove:
+            self.widget.delete(*remove)
+
+        for pos, idx in enumerate(range(start, keep_start)):
+            self._insert(pos, idx)
+        for idx in range(max(start, keep_end), end):
+            self._insert("end", idx)
+
+        self.start, self.end = start, end
+        self.element.tree_ids = [str(idx + 1) for idx in range(start, end)]
+        self._apply_selection()
+
+    def _insert(self, pos, idx: int):
+        iid = self.widget.insert("", pos, iid=idx + 1, values=self.rows[idx], tag=idx)
+        self.widget.tag_configure(iid, background=self.element.BackgroundColor)
+
+    def _apply_selection(self):
+        self.widget.selection_set(
+            [idx + 1 for idx in sorted(self.selected) if self.start <= idx < self.end]
+        )
+        self.element.SelectedRows = sorted(self.selected)